@@ -0,0 +1,103 @@
+# bm25_index.py
+# Compact BM25 inverted index (array-backed, delta-encoded postings) and
+# reciprocal rank fusion for hybrid keyword + dense retrieval.
+import json, os, re
+from collections import Counter
+import numpy as np
+
+TOKEN = re.compile(r"\w+")
+FILES = ("bm25_offsets.npy", "bm25_docs.npy", "bm25_tfs.npy", "bm25_doclen.npy")
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over documents numbered 0..n-1.
+
+    Postings for term t live in docs[offsets[t]:offsets[t+1]] (doc-id gaps, uint32)
+    and tfs[...] (term frequencies, uint16); ids are recovered with a cumsum at
+    query time. All arrays are plain .npy files opened with mmap on load.
+    """
+
+    def __init__(self, vocab, offsets, docs, tfs, doc_len, k1=1.2, b=0.75):
+        self.vocab = vocab
+        self.offsets, self.docs, self.tfs, self.doc_len = offsets, docs, tfs, doc_len
+        self.k1, self.b = k1, b
+        self.n_docs = len(doc_len)
+        self.avg_len = float(np.mean(doc_len)) if self.n_docs else 0.0
+
+    @classmethod
+    def build(cls, texts, **kwargs):
+        postings, doc_len = {}, []
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+        terms = sorted(postings)
+        vocab = {t: i for i, t in enumerate(terms)}
+        sizes = np.array([len(postings[t]) for t in terms], dtype=np.int64)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        docs = np.empty(offsets[-1], dtype=np.uint32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for i, t in enumerate(terms):
+            ids, freqs = zip(*postings[t])
+            ids = np.array(ids, dtype=np.int64)
+            docs[offsets[i]:offsets[i + 1]] = np.diff(ids, prepend=0)
+            tfs[offsets[i]:offsets[i + 1]] = np.minimum(freqs, 65535)
+        return cls(vocab, offsets, docs, tfs, np.array(doc_len, dtype=np.float32), **kwargs)
+
+    def save(self, index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+        for name, arr in zip(FILES, (self.offsets, self.docs, self.tfs, self.doc_len)):
+            np.save(os.path.join(index_dir, name), arr)
+        with open(os.path.join(index_dir, "bm25_vocab.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": sorted(self.vocab, key=self.vocab.get)}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, index_dir):
+        with open(os.path.join(index_dir, "bm25_vocab.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = [np.load(os.path.join(index_dir, name), mmap_mode="r") for name in FILES]
+        vocab = {t: i for i, t in enumerate(meta["terms"])}
+        return cls(vocab, *arrays, k1=meta["k1"], b=meta["b"])
+
+    @staticmethod
+    def exists(index_dir):
+        return os.path.exists(os.path.join(index_dir, "bm25_vocab.json"))
+
+    def scores(self, query):
+        """Dense array of BM25 scores for every document."""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * np.asarray(self.doc_len) / max(self.avg_len, 1e-9))
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            lo, hi = self.offsets[t], self.offsets[t + 1]
+            ids = np.cumsum(self.docs[lo:hi], dtype=np.int64)
+            tf = self.tfs[lo:hi].astype(np.float32)
+            idf = np.log1p((self.n_docs - (hi - lo) + 0.5) / ((hi - lo) + 0.5))
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + norm[ids])
+        return scores
+
+    def search(self, query, k=10):
+        """Top-k (score, doc_id) with a positive score."""
+        scores = self.scores(query)
+        if not self.n_docs:
+            return []
+        top = np.argpartition(-scores, min(k, self.n_docs) - 1)[:k] if k < self.n_docs else np.arange(self.n_docs)
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(i)) for i in top if scores[i] > 0]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked lists of doc ids: score(d) = sum 1 / (k + rank). Returns [(score, doc_id)] best first."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(((s, d) for d, s in fused.items()), reverse=True)
@@ -0,0 +1,108 @@
+# browser_pool.py
+# Long-lived Playwright browser shared by a crawl, instead of one Chromium per URL.
+from contextlib import contextmanager
+from playwright.sync_api import sync_playwright
+
+
+class BrowserPool:
+    """One Chromium process with `size` reusable contexts/pages.
+
+    Pages are handed out with `with pool.page() as page:` and returned to the
+    pool afterwards. A context is recycled after `max_uses` pages to keep memory
+    bounded, and a crashed/disconnected browser is relaunched on the next checkout.
+    Without `start()` the browser is launched on the first checkout, so a crawl
+    that never needs it never pays for it.
+    """
+
+    def __init__(self, size=2, headless=True, max_uses=50, context_args=None, setup=None):
+        self.size = size
+        self.setup = setup   # called with each new context, e.g. LoadPolicy.install
+        self.headless = headless
+        self.max_uses = max_uses
+        self.context_args = context_args or {}
+        self._pw = None
+        self._browser = None
+        self._idle = []      # [(context, page, uses)]
+        self.restarts = 0
+
+    def start(self):
+        if self._pw is None:
+            self._pw = sync_playwright().start()
+        self._launch()
+        return self
+
+    def _launch(self):
+        self._browser = self._pw.chromium.launch(headless=self.headless)
+        self._idle = []
+
+    def healthy(self):
+        return self._browser is not None and self._browser.is_connected()
+
+    def _restart(self):
+        try:
+            if self._browser is not None:
+                self._browser.close()
+        except Exception:
+            pass
+        self.restarts += 1
+        self._launch()
+
+    def _new_slot(self):
+        context = self._browser.new_context(**self.context_args)
+        if self.setup:
+            self.setup(context)
+        return context, context.new_page(), 0
+
+    def _checkout(self):
+        if self._pw is None:
+            self.start()
+        elif not self.healthy():
+            self._restart()
+        while self._idle:
+            context, page, uses = self._idle.pop()
+            if not page.is_closed():
+                return context, page, uses
+            self._discard(context)
+        return self._new_slot()
+
+    def _discard(self, context):
+        try:
+            context.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def page(self):
+        context, page, uses = self._checkout()
+        ok = False
+        try:
+            yield page
+            ok = True
+        finally:
+            uses += 1
+            if not self.healthy():
+                self._restart()
+            elif not ok or page.is_closed() or uses >= self.max_uses or len(self._idle) >= self.size:
+                # errored pages may be left mid-navigation; start the next caller fresh
+                self._discard(context)
+            else:
+                self._idle.append((context, page, uses))
+
+    def close(self):
+        for context, _, _ in self._idle:
+            self._discard(context)
+        self._idle = []
+        try:
+            if self._browser is not None:
+                self._browser.close()
+        finally:
+            self._browser = None
+            if self._pw is not None:
+                self._pw.stop()
+                self._pw = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,6 +1,7 @@
 # compare_pipelines.py
-import json, subprocess, shutil, csv, os
+import json, subprocess, shutil, csv, os, sys, argparse, tempfile, time, statistics
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 PIPELINES = [
     ("requests+bs4", ["python", "pipeline_a_bs4.py"]),
@@ -8,14 +9,37 @@ PIPELINES = [
     ("playwright",   ["python", "pipeline_c_playwright.py"]),
 ]
 
+# per-run metrics aggregated by the benchmark (mean and 95% confidence half-width)
+BENCH_METRICS = ["latency_p50_s", "latency_p95_s", "throughput_pages_per_sec", "bytes_total", "cpu_s", "peak_rss_mb"]
+
+# two-sided 95% Student t quantiles by degrees of freedom; larger df fall back to the closest entry below
+T95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+       10: 2.228, 15: 2.131, 20: 2.086, 30: 2.042, 60: 2.000, 120: 1.980}
+
 def run(cmd):
-    p = subprocess.run(cmd, capture_output=True, text=True)
+    """Run one pipeline and return its JSON report plus wall time, CPU seconds and peak RSS.
+
+    Resource usage comes from os.wait4, so it covers the pipeline process and
+    every child it waited for (extractor processes, the browser).
+    """
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        t0 = time.perf_counter()
+        p = subprocess.Popen(cmd, stdout=out, stderr=err)
+        _, status, ru = os.wait4(p.pid, 0)
+        p.returncode = os.waitstatus_to_exitcode(status)
+        wall = time.perf_counter() - t0
+        out.seek(0); err.seek(0)
+        stdout, stderr = out.read().decode("utf-8", "replace"), err.read().decode("utf-8", "replace")
     if p.returncode!=0:
-        return {"pipeline": cmd[-1], "error": p.stderr.strip()}
+        return {"pipeline": cmd[1], "error": stderr.strip()}
     try:
-        return json.loads(p.stdout)
+        res = json.loads(stdout)
     except Exception:
-        return {"pipeline": cmd[-1], "error": "invalid_json"}
+        return {"pipeline": cmd[1], "error": "invalid_json"}
+    rss_unit = 1024 * 1024 if sys.platform == "darwin" else 1024   # ru_maxrss is bytes on macOS, KiB on Linux
+    res.update(wall_s=round(wall, 3), cpu_s=round(ru.ru_utime + ru.ru_stime, 3),
+               peak_rss_mb=round(ru.ru_maxrss / rss_unit, 1))
+    return res
 
 def summarize_failures(failures):
     kinds = []
@@ -28,15 +52,86 @@ def summarize_failures(failures):
             kinds.append("unknown")
     return dict(Counter(kinds).most_common(6))
 
+def percentile(values, q):
+    """Linear-interpolated q-th percentile (0-100) of a non-empty list."""
+    xs = sorted(values)
+    pos = (len(xs) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+def mean_ci(values):
+    """(mean, 95% confidence half-width) over runs; the half-width is None for a single run."""
+    m = statistics.fmean(values)
+    if len(values) < 2:
+        return m, None
+    df = len(values) - 1
+    t = T95[max(k for k in T95 if k <= df)]
+    return m, t * statistics.stdev(values) / len(values) ** 0.5
+
+def run_metrics(res):
+    # per-page latency without the time spent queued on the per-host rate limiter ("wait" stage)
+    lat = [p["elapsed"] - p.get("stages", {}).get("wait", 0.0) for p in res.get("pages", []) if p.get("elapsed") is not None]
+    return {
+        "latency_p50_s": percentile(lat, 50) if lat else None,
+        "latency_p95_s": percentile(lat, 95) if lat else None,
+        "throughput_pages_per_sec": res["throughput_pages_per_sec"],
+        "bytes_total": res.get("bytes_total"),
+        "cpu_s": res.get("cpu_s"),
+        "peak_rss_mb": res.get("peak_rss_mb"),
+    }
+
+def make_row(runs):
+    """One report row from one or more successful runs of the same pipeline."""
+    res = runs[0]
+    row = {
+        "pipeline": res["pipeline"],
+        "pages_total": res["pages_total"],
+        "pages_ok": res["pages_ok"],
+        "tokens_total": res["tokens_total"],
+        "avg_noise_ratio": res["avg_noise_ratio"],
+        "top_failures": summarize_failures(res.get("failures",[])),
+        "runs": len(runs),
+    }
+    per_run = [run_metrics(r) for r in runs]
+    for m in BENCH_METRICS:
+        values = [r[m] for r in per_run if r[m] is not None]
+        mean, ci = mean_ci(values) if values else (None, None)
+        row[m] = round(mean, 4) if mean is not None else None
+        row[m + "_ci95"] = round(ci, 4) if ci is not None else None
+    row["stage_seconds"] = stage_seconds(runs)
+    return row
+
+def stage_seconds(runs):
+    """Mean total seconds per instrumented stage (see instrumentation.py), largest first."""
+    totals = Counter()
+    for r in runs:
+        for stage, h in r.get("stages", {}).items():
+            totals[stage] += h["sum_s"] / len(runs)
+    return {stage: round(s, 3) for stage, s in totals.most_common()}
+
+def fmt_stages(stages):
+    total = sum(stages.values())
+    return "<br>".join(f"{stage}: {s}s ({s / total:.0%})" for stage, s in stages.items()) if total else ""
+
 def write_csv(rows, filename="comparison_report.csv"):
     keys = ["pipeline","pages_total","pages_ok","tokens_total",
-            "avg_noise_ratio","throughput_pages_per_sec","top_failures"]
+            "avg_noise_ratio","throughput_pages_per_sec","top_failures",
+            "runs","throughput_pages_per_sec_ci95","latency_p50_s","latency_p50_s_ci95",
+            "latency_p95_s","latency_p95_s_ci95","bytes_total","bytes_total_ci95",
+            "cpu_s","cpu_s_ci95","peak_rss_mb","peak_rss_mb_ci95","stage_seconds"]
     with open(filename,"w",newline="") as f:
         w = csv.DictWriter(f, fieldnames=keys)
         w.writeheader()
         for row in rows:
             w.writerow({k: row.get(k) for k in keys})
 
+def fmt_ci(row, key):
+    value, ci = row.get(key), row.get(key + "_ci95")
+    if value is None:
+        return ""
+    return f"{value} &plusmn; {ci}" if ci is not None else f"{value}"
+
 def write_html(rows, filename="comparison_report.html"):
     html = """
     <html><head>
@@ -50,6 +145,7 @@ def write_html(rows, filename="comparison_report.html"):
     </style>
     </head><body>
     <h2>Pipeline Comparison Report</h2>
+    <p>Values with &plusmn; are means over runs with a 95% confidence half-width.</p>
     <table>
       <tr>
         <th>Pipeline</th>
@@ -59,11 +155,18 @@ def write_html(rows, filename="comparison_report.html"):
         <th>Avg Noise Ratio</th>
         <th>Throughput (pages/sec)</th>
         <th>Top Failures</th>
+        <th>Runs</th>
+        <th>Latency p50 (s)</th>
+        <th>Latency p95 (s)</th>
+        <th>Bytes Fetched</th>
+        <th>CPU (s)</th>
+        <th>Peak RSS (MB)</th>
+        <th>Time by Stage</th>
       </tr>
     """
     for row in rows:
         if "error" in row:
-            html += f"<tr><td>{row['pipeline']}</td><td colspan=6 class='err'>{row['error']}</td></tr>"
+            html += f"<tr><td>{row['pipeline']}</td><td colspan=13 class='err'>{row['error']}</td></tr>"
             continue
         html += f"""
         <tr>
@@ -72,34 +175,82 @@ def write_html(rows, filename="comparison_report.html"):
           <td>{row['pages_ok']}</td>
           <td>{row['tokens_total']}</td>
           <td>{row['avg_noise_ratio']}</td>
-          <td>{row['throughput_pages_per_sec']}</td>
+          <td>{fmt_ci(row, 'throughput_pages_per_sec')}</td>
           <td>{json.dumps(row['top_failures'])}</td>
+          <td>{row['runs']}</td>
+          <td>{fmt_ci(row, 'latency_p50_s')}</td>
+          <td>{fmt_ci(row, 'latency_p95_s')}</td>
+          <td>{fmt_ci(row, 'bytes_total')}</td>
+          <td>{fmt_ci(row, 'cpu_s')}</td>
+          <td>{fmt_ci(row, 'peak_rss_mb')}</td>
+          <td>{fmt_stages(row['stage_seconds'])}</td>
         </tr>
         """
     html += "</table></body></html>"
     with open(filename,"w") as f:
         f.write(html)
 
-if __name__ == "__main__":
+def benchmark(pipelines, urls_file, repeat=5, jobs=None):
+    """Run every pipeline `repeat` times on the frozen URL set in `urls_file`.
+
+    Within a round the pipelines run in parallel (up to `jobs` at once); rounds
+    run back to back so repeats of the same pipeline never overlap.
+    """
+    runs = {name: [] for name, _ in pipelines}
+    errors = {}
+    with ThreadPoolExecutor(jobs or len(pipelines)) as pool:
+        for i in range(repeat):
+            futures = {name: pool.submit(run, cmd + ["--urls", urls_file]) for name, cmd in pipelines}
+            for name, fut in futures.items():
+                res = fut.result()
+                if "error" in res:
+                    errors[name] = res["error"]
+                else:
+                    runs[name].append(res)
+            print(f"round {i + 1}/{repeat} done", file=sys.stderr)
     rows = []
+    for name, _ in pipelines:
+        if runs[name]:
+            rows.append(make_row(runs[name]))
+        else:
+            rows.append({"pipeline": name, "error": errors.get(name, "no runs")})
+    return rows
+
+def freeze_urls(results, filename):
+    """Write the URLs the pipelines fetched successfully, for later --benchmark runs."""
+    urls = sorted({p["url"] for res in results for p in res.get("pages", []) if p.get("status") == 200})
+    with open(filename, "w") as f:
+        f.write("\n".join(urls) + "\n")
+    print(f"Froze {len(urls)} URLs to {filename}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--benchmark", action="store_true", help="repeat runs in parallel on a frozen URL set (needs --urls)")
+    ap.add_argument("--urls", default=None, help="frozen URL list (one per line) passed to every pipeline")
+    ap.add_argument("--repeat", type=int, default=5, help="runs per pipeline in benchmark mode")
+    ap.add_argument("--jobs", type=int, default=None, help="pipelines run at once in benchmark mode (default: all)")
+    ap.add_argument("--freeze", default=None, help="after a normal run, write the successfully fetched URLs here")
+    args = ap.parse_args()
+    if args.benchmark and not args.urls:
+        ap.error("--benchmark needs --urls (create one with --freeze)")
+    available, rows, results = [], [], []
     for name, cmd in PIPELINES:
         if shutil.which(cmd[0]) is None:
             rows.append({"pipeline": name, "error": f"{cmd[0]} not found"})
-            continue
-        res = run(cmd)
-        if "error" in res:
-            rows.append({"pipeline": name, "error": res["error"]})
-            continue
-        rows.append({
-            "pipeline": res["pipeline"],
-            "pages_total": res["pages_total"],
-            "pages_ok": res["pages_ok"],
-            "tokens_total": res["tokens_total"],
-
-           "avg_noise_ratio": res["avg_noise_ratio"],
-            "throughput_pages_per_sec": res["throughput_pages_per_sec"],
-            "top_failures": summarize_failures(res.get("failures",[]))
-        })
+        else:
+            available.append((name, cmd))
+    if args.benchmark:
+        rows += benchmark(available, args.urls, args.repeat, args.jobs)
+    else:
+        for name, cmd in available:
+            res = run(cmd + (["--urls", args.urls] if args.urls else []))
+            if "error" in res:
+                rows.append({"pipeline": name, "error": res["error"]})
+                continue
+            results.append(res)
+            rows.append(make_row([res]))
+        if args.freeze:
+            freeze_urls(results, args.freeze)
     # write JSON, CSV, HTML
     with open("comparison_report.json","w") as f: json.dump(rows, f, indent=2)
     write_csv(rows)
@@ -0,0 +1,75 @@
+# crawl_checkpoint.py
+# Append-only crawl journal so a long crawl can be resumed after a crash.
+import json, os
+
+
+class CrawlJournal:
+    """JSONL journal with one line per finished page: its emitted record, the
+    frontier items it enqueued and, with de-dup on, the state it added to the deduper.
+
+    Replaying the journal rebuilds the records, the visited set and the pending
+    frontier exactly, so nothing is fetched twice. Lines are flushed as they are
+    written and fsync'd every `fsync_every` pages; a torn last line from a crash
+    is ignored on replay.
+    """
+
+    def __init__(self, path="scrape_all.journal.jsonl", fsync_every=10):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._f = None
+        self._since_sync = 0
+        self._valid_bytes = None   # end of the last intact line seen by replay()
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def open(self, resume=False):
+        if resume and self._valid_bytes is not None:
+            with open(self.path, "r+b") as f:
+                f.truncate(self._valid_bytes)   # drop a torn tail before appending
+        self._f = open(self.path, "a" if resume else "w", encoding="utf-8")
+        return self
+
+    def replay(self, initial_items, on_record):
+        """Feed every journaled record and its de-dup state to `on_record(record, dedupe)`
+        and return (pages_done, visited_urls, pending_items) given the crawl's
+        initial frontier items."""
+        done, items, offset = set(), list(initial_items), 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    entry = json.loads(line)
+                except ValueError:
+                    break   # torn write at the crash point
+                offset += len(line)
+                on_record(entry["record"], entry.get("dedupe"))
+                done.add(entry["url"])
+                items.extend(entry["enqueued"])
+        self._valid_bytes = offset
+        visited = [item["url"] for item in items]
+        pending = [item for item in items if item["url"] not in done]
+        return len(done), visited, pending
+
+    def log_page(self, url, record, enqueued, dedupe=None):
+        entry = {"url": url, "record": record, "enqueued": enqueued}
+        if dedupe is not None:
+            entry["dedupe"] = dedupe   # dedupe.PageDeduper.last, replayed on resume
+        self._f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self._since_sync += 1
+        if self._since_sync >= self.fsync_every:
+            self.checkpoint()
+
+    def checkpoint(self):
+        if self._f is not None:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._since_sync = 0
+
+    def close(self):
+        if self._f is not None:
+            self.checkpoint()
+            self._f.close()
+            self._f = None
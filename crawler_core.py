@@ -0,0 +1,530 @@
+# crawler_core.py
+# One crawl engine behind the three pipelines: shared frontier, worker pool,
+# record/report format and instrumentation, with pluggable fetchers
+# (requests / aiohttp / trafilatura / Playwright) and extractors
+# (html_extract / trafilatura / rendered innerText).
+import asyncio, itertools, json, re, sys, time
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin, urlparse
+import numpy as np
+from frontier import Frontier
+from instrumentation import Recorder
+from page_records import PageTable, NO_STATUS
+
+# `body` is the decoded document; `text`/`links` are filled by fetchers that
+# extract in the page itself (Playwright) and are None otherwise.
+Fetched = namedtuple("Fetched", "url status body bytes text links", defaults=(None, None))
+
+
+class PageError(Exception):
+    """A page that yields no usable document; becomes an error record with `status`."""
+
+    def __init__(self, status, error, nbytes=0):
+        super().__init__(error)
+        self.status, self.error, self.bytes = status, error, nbytes
+
+    def __reduce__(self):  # raised in extractor processes, so it must survive pickling
+        return PageError, (self.status, self.error, self.bytes)
+
+
+def tokenize(s):  # simple token approximation (~word count)
+    return len(re.findall(r"\w+", s))
+
+
+def error_record(url, status, error):
+    return {"url": url, "status": status, "error": error, "tokens": 0, "noise_ratio": None}
+
+
+def page_record(url, status, raw, text):
+    noise_ratio = (len(raw) - len(text)) / max(len(raw), 1)
+    return {"url": url, "status": status, "tokens": tokenize(text), "noise_ratio": round(noise_ratio, 3)}
+
+
+class LazyRows:
+    """Re-iterable report list whose dicts are built from a PageTable one row at a time."""
+
+    def __init__(self, build, rows):
+        self.build, self.rows = build, rows
+
+    def __iter__(self):
+        return (self.build(int(i)) for i in self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def build_report(pipeline, results, elapsed, recorder=None, any_status=False):
+    """The pipelines' common report, aggregated over a PageTable's columns (a list
+    of record dicts is converted first). With `any_status` (rendered pages) a
+    page counts as fetched whatever its HTTP status, otherwise only on 200.
+    "pages" and "failures" are LazyRows; write the report with dump_report."""
+    table = results if isinstance(results, PageTable) else PageTable.from_records(results)
+    status, tokens = table.column("status"), table.column("tokens")
+    ok = ((status != NO_STATUS) if any_status else (status == 200)) & (tokens > 0)
+    n_ok = int(ok.sum())
+    avg_noise = round(float(table.column("noise_ratio")[ok].mean()), 3) if n_ok else 0.0
+
+    def page(i):
+        r = table.record(i)
+        row = {k: r[k] for k in ("url", "status", "elapsed", "bytes")}
+        if table.text_ref(i):
+            row["text"] = table.text_ref(i)   # (offset, length) in the text store
+        row["stages"] = table.stages(i)
+        return row
+
+    return {
+        "pipeline": pipeline,
+        "pages_total": len(table),
+        "pages_ok": n_ok,
+        "tokens_total": int(tokens[ok].sum()),
+        "avg_noise_ratio": avg_noise if n_ok or not any_status else None,
+        "throughput_pages_per_sec": round(len(table) / max(elapsed, 1e-6), 2),
+        "bytes_total": int(table.column("bytes").sum()),
+        "pages": LazyRows(page, range(len(table))),
+        "stages": recorder.histograms() if recorder else {},
+        "failures": LazyRows(table.record, np.flatnonzero(~ok)),
+    }
+
+
+def dump_report(report, out=None):
+    """Write `report` as JSON, streaming LazyRows one row per line instead of building the lists."""
+    out = out or sys.stdout
+    out.write("{")
+    for n, (key, value) in enumerate(report.items()):
+        out.write(("," if n else "") + "\n  " + json.dumps(key) + ": ")
+        if isinstance(value, LazyRows):
+            out.write("[")
+            for m, row in enumerate(value):
+                out.write(("," if m else "") + "\n    " + json.dumps(row))
+            out.write("\n  ]" if len(value) else "]")
+        else:
+            out.write(json.dumps(value, indent=2).replace("\n", "\n  "))
+    out.write("\n}\n")
+
+
+# ---------------------------------------------------------------- fetchers
+# async start() / close() / fetch(url, recorder, want_links) -> Fetched, or raise PageError
+
+class RequestsFetcher:
+    """requests (through http_cache.cached_get) on worker threads; only 200 text/html is usable.
+    With `rate`, requests/sec per host are capped by the same limiter as AiohttpFetcher.
+    Stages: wait (rate limiter), ttfb (incl. DNS/connect), download."""
+
+    def __init__(self, headers=None, timeout=20, cache=None, rate=None):
+        self.headers, self.timeout, self.cache, self.rate = headers or {}, timeout, cache, rate
+
+    async def start(self):
+        from rate_limit import HostLimiter
+        self.limiter = HostLimiter(per_host=1, rate=self.rate)
+
+    async def close(self):
+        pass
+
+    async def fetch(self, url, recorder, want_links=True):
+        t = time.perf_counter()
+        async with self.limiter.slot(urlparse(url).netloc.lower()):
+            recorder.observe("wait", time.perf_counter() - t, url)
+            return await asyncio.to_thread(self._fetch, url, recorder)
+
+    def _fetch(self, url, recorder):
+        from http_cache import cached_get
+        t = time.perf_counter()
+        r = cached_get(url, self.cache, headers=self.headers, timeout=self.timeout)
+        fetch_s = time.perf_counter() - t
+        ttfb = min(r.elapsed.total_seconds(), fetch_s)   # requests' time to response headers
+        recorder.observe("ttfb", ttfb, url)
+        recorder.observe("download", fetch_s - ttfb, url)
+        nbytes = 0 if getattr(r, "from_cache", False) else len(r.content)
+        recorder.add_bytes(nbytes)
+        if r.status_code != 200 or "text/html" not in r.headers.get("Content-Type", ""):
+            raise PageError(r.status_code, "non-html", nbytes)
+        return Fetched(url, 200, r.text, nbytes)
+
+
+class AiohttpFetcher:
+    """One keep-alive aiohttp pool; `per_host` concurrent requests and `rate` req/s (None: no cap) per host.
+    Stages: wait (rate limiter), dns, connect, ttfb, download."""
+
+    def __init__(self, headers=None, timeout=20, cache=None, concurrency=16, per_host=4, rate=None):
+        self.headers, self.timeout, self.cache = headers or {}, timeout, cache
+        self.concurrency, self.per_host, self.rate = concurrency, per_host, rate
+        self.session = None
+
+    async def start(self):
+        import aiohttp
+        from rate_limit import HostLimiter
+        from instrumentation import connection_trace_config
+        self.limiter = HostLimiter(per_host=self.per_host, rate=self.rate)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        self.session = aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                             trace_configs=[connection_trace_config()])
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def fetch(self, url, recorder, want_links=True):
+        from http_cache import decode_body
+        cond = self.cache.conditional_headers(url) if self.cache is not None else {}
+        status, headers, body = await self._get(url, cond, recorder)
+        nbytes = len(body)
+        hit = self.cache.revalidated(url) if self.cache is not None and status == 304 else None
+        if self.cache is not None and status == 304 and hit is None:
+            # entry vanished between the two calls: fetch it unconditionally
+            status, headers, body = await self._get(url, {}, recorder)
+            nbytes += len(body)
+        if hit:
+            status, headers, body = hit
+            ctype = headers.get("content-type", "")
+        else:
+            ctype = headers.get("Content-Type", "")
+            if self.cache is not None:
+                self.cache.store(url, status, headers, body)
+        if status != 200 or "text/html" not in ctype:
+            raise PageError(status, "non-html", nbytes)
+        return Fetched(url, 200, decode_body(body, ctype), nbytes)
+
+    async def _get(self, url, req_headers, recorder):
+        t = time.perf_counter()
+        async with self.limiter.slot(urlparse(url).netloc.lower()):
+            recorder.observe("wait", time.perf_counter() - t, url)
+            trace, t_req = {}, time.perf_counter()
+            async with self.session.get(url, headers=req_headers, trace_request_ctx=trace) as r:
+                t_head = time.perf_counter()
+                status, headers = r.status, r.headers
+                body = await r.read()
+                recorder.observe("download", time.perf_counter() - t_head, url)
+        dns, connect = trace.get("dns", 0.0), trace.get("connect", 0.0)
+        if connect:
+            recorder.observe("dns", dns, url)
+            recorder.observe("connect", connect - dns, url)
+        recorder.observe("ttfb", t_head - t_req - connect, url)
+        recorder.add_bytes(len(body))
+        return status, headers, body
+
+
+class TrafilaturaFetcher:
+    """trafilatura.fetch_url on worker threads (or cached_get with an http_cache.HttpCache).
+    Anything without a document is "fetch_failed". Stages: download."""
+
+    def __init__(self, http_cache=None, user_agent=None):
+        self.http_cache, self.user_agent = http_cache, user_agent
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch(self, url, recorder, want_links=True):
+        return await asyncio.to_thread(self._fetch, url, recorder)
+
+    def _fetch(self, url, recorder):
+        t, nbytes = time.perf_counter(), 0
+        try:
+            if self.http_cache is not None:
+                from http_cache import cached_get
+                r = cached_get(url, self.http_cache, headers={"User-Agent": self.user_agent} if self.user_agent else None)
+                nbytes = 0 if r.from_cache else len(r.content)
+                downloaded = r.text if r.status_code == 200 else None
+            else:
+                import trafilatura
+                downloaded = trafilatura.fetch_url(url)
+                nbytes = len(downloaded.encode("utf-8")) if downloaded else 0
+        except Exception:
+            downloaded = None
+        recorder.observe("download", time.perf_counter() - t, url)
+        recorder.add_bytes(nbytes)
+        if not downloaded:
+            raise PageError(None, "fetch_failed", nbytes)
+        return Fetched(url, 200, downloaded, nbytes)
+
+
+class PlaywrightFetcher:
+    """Headless Chromium with `workers` pages, each in its own context, rendered
+    under a page_loading.LoadPolicy. Text (innerText without script/style/
+    noscript/svg) and hrefs are read in the page. A page that fails or blows
+    `page_budget` seconds is closed and replaced; if its context is gone too a
+    new one is made, and a crashed/disconnected browser is relaunched (as in
+    browser_pool.BrowserPool), so one crash never poisons the remaining fetches.
+    Stages: navigate, render_wait, dom (content + innerText), links."""
+
+    TEXT_JS = """() => {
+        const kill = s => s && s.remove();
+        document.querySelectorAll('script,style,noscript,svg').forEach(kill);
+        return document.body ? document.body.innerText : '';
+    }"""
+
+    def __init__(self, workers=4, policy=None, page_budget=60, nav_timeout=45000):
+        self.workers, self.policy, self.page_budget, self.nav_timeout = workers, policy, page_budget, nav_timeout
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+        from page_loading import LoadPolicy
+        self.policy = self.policy or LoadPolicy()
+        self._pw = await async_playwright().start()
+        self._lock = asyncio.Lock()
+        self._generation = 0   # bumped on every relaunch; slots from older browsers are replaced
+        self.restarts = 0
+        self.browser = await self._pw.chromium.launch(headless=True)
+        self.pages = asyncio.Queue()
+        for _ in range(self.workers):
+            self.pages.put_nowait(await self._new_slot())
+
+    async def _new_slot(self):
+        context = await self.browser.new_context(java_script_enabled=True)
+        await self.policy.install_async(context)
+        return self._generation, context, await context.new_page()
+
+    async def _relaunch(self):
+        try:
+            await self.browser.close()
+        except Exception:
+            pass
+        self.restarts += 1
+        self._generation += 1
+        self.browser = await self._pw.chromium.launch(headless=True)
+
+    async def _checkout(self, slot):
+        """A usable (generation, context, page) for `slot`, relaunching or rebuilding what is broken."""
+        generation, context, page = slot
+        async with self._lock:
+            if not self.browser.is_connected():
+                await self._relaunch()
+        if generation == self._generation and not page.is_closed():
+            return slot
+        if generation == self._generation:
+            try:
+                return generation, context, await context.new_page()
+            except Exception:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+        return await self._new_slot()
+
+    async def close(self):
+        while not self.pages.empty():
+            _, context, _ = self.pages.get_nowait()
+            try:
+                await context.close()
+            except Exception:
+                pass
+        try:
+            await self.browser.close()
+        finally:
+            await self._pw.stop()
+
+    async def fetch(self, url, recorder, want_links=True):
+        slot = await self.pages.get()
+        try:
+            slot = await self._checkout(slot)
+            return await asyncio.wait_for(self._render(slot[2], url, recorder, want_links), self.page_budget)
+        except Exception:
+            # the page may be wedged mid-navigation or crashed; the next URL gets a fresh one
+            try:
+                await slot[2].close()
+            except Exception:
+                pass
+            try:
+                slot = await self._checkout(slot)
+            except Exception:
+                pass   # still broken: the next checkout of this slot tries again
+            raise
+        finally:
+            self.pages.put_nowait(slot)
+
+    async def _render(self, page, url, recorder, want_links):
+        with recorder.span("navigate", url):
+            response = await page.goto(url, wait_until=self.policy.wait_until, timeout=self.nav_timeout)
+        with recorder.span("render_wait", url):
+            await self.policy.wait_ready_async(page)
+        with recorder.span("dom", url):
+            html = await page.content()
+            text = await page.evaluate(self.TEXT_JS)
+        nbytes = len(html.encode("utf-8"))   # the rendered document; subresources are not counted
+        recorder.add_bytes(nbytes)
+        links = []
+        if want_links:
+            with recorder.span("links", url):
+                hrefs = await page.eval_on_selector_all("a[href]", "els => els.map(e => e.getAttribute('href'))")
+            links = [urljoin(url, h.split("#")[0]) for h in hrefs if h]
+        return Fetched(url, response.status if response else None, html, nbytes, text, links)
+
+
+# ---------------------------------------------------------------- extractors
+# picklable callables: extractor(fetched) -> (text, links)
+
+class HtmlExtractor:
+    """Single-parse text + absolute links via html_extract (selectolax / lxml / html.parser)."""
+
+    def __init__(self, parser=None):
+        self.parser = parser
+
+    def __call__(self, fetched):
+        from html_extract import extract_page
+        page = extract_page(fetched.body, fetched.url, backend=self.parser)
+        return page.text, page.links
+
+
+class TrafilaturaExtractor:
+    """trafilatura main-content extraction; pages without main content are "no_main_content"."""
+
+    def __call__(self, fetched):
+        import trafilatura
+        extracted = trafilatura.extract(fetched.body, include_tables=False, include_links=False)
+        if not extracted:
+            raise PageError(fetched.status, "no_main_content", fetched.bytes)
+        return extracted, []
+
+
+class InnerTextExtractor:
+    """Uses the text and links a rendering fetcher already read from the page."""
+
+    def __call__(self, fetched):
+        return fetched.text or "", fetched.links or []
+
+
+# ---------------------------------------------------------------- engine
+
+class CrawlEngine:
+    """Frontier + `concurrency` async workers + records, shared by every pipeline.
+
+    Seeds and followed links go through one frontier.Frontier; only hosts in
+    `allowed_hosts` (all, if None) are crawled, links are followed up to
+    `max_depth` when `follow` is set, and at most `max_pages` pages are
+    fetched. `extract_in` runs the extractor "inline", on a "thread" or in a
+    "process" pool of `extract_workers`. Hybrid mode: with `render` = (fetcher,
+    extractor), a page whose first pass yields fewer than `render_below` tokens
+    is fetched again with it (e.g. static first, render only when empty); the
+    render fetcher is only started once the first page needs it (and dropped,
+    keeping the static results, if it fails to start).
+    Results come back as a page_records.PageTable in discovery order; with a
+    `text_store` (page_records.TextStore) the extracted text is spilled to it.
+    """
+
+    def __init__(self, fetcher, extractor, allowed_hosts=None, max_pages=200, max_depth=None, follow=True,
+                 concurrency=4, extract_in="thread", extract_workers=None, render=None, render_below=1,
+                 bloom_capacity=None, text_store=None, recorder=None):
+        self.fetcher, self.extractor = fetcher, extractor
+        self.allowed_hosts = allowed_hosts
+        self.max_pages, self.max_depth, self.follow = max_pages, max_depth, follow
+        self.concurrency = concurrency
+        self.extract_in, self.extract_workers = extract_in, extract_workers
+        self.render, self.render_below = render, render_below
+        self.bloom_capacity = bloom_capacity
+        self.text_store = text_store
+        self.recorder = recorder or Recorder()
+        self._pool = None
+        self._started = []
+        self._start_lock = None
+
+    def allowed(self, url):
+        return self.allowed_hosts is None or urlparse(url).netloc.lower() in self.allowed_hosts
+
+    async def _extract(self, extractor, fetched):
+        if self.extract_in == "process":
+            return await asyncio.get_running_loop().run_in_executor(self._pool, extractor, fetched)
+        if self.extract_in == "thread":
+            return await asyncio.to_thread(extractor, fetched)
+        return extractor(fetched)
+
+    async def _process(self, fetcher, extractor, url, want_links):
+        t = time.perf_counter()
+        links, text = [], None
+        try:
+            fetched = await fetcher.fetch(url, self.recorder, want_links)
+            with self.recorder.span("extract", url):
+                text, links = await self._extract(extractor, fetched)
+            record, nbytes = page_record(url, fetched.status, fetched.body, text), fetched.bytes
+        except PageError as e:
+            record, nbytes = error_record(url, e.status, e.error), e.bytes
+        except Exception as e:
+            record, nbytes = error_record(url, None, str(e) or type(e).__name__), 0
+        record.update(elapsed=round(time.perf_counter() - t, 4), bytes=nbytes)
+        return record, links, text
+
+    async def _start(self, fetcher):
+        async with self._start_lock:
+            if fetcher not in self._started:
+                await fetcher.start()
+                self._started.append(fetcher)
+
+    async def _start_render(self):
+        """Start the render tier on first use; if it cannot start, drop it so later pages keep their static result."""
+        async with self._start_lock:
+            if self.render is not None and self.render[0] not in self._started:
+                try:
+                    await self.render[0].start()
+                    self._started.append(self.render[0])
+                except Exception as e:
+                    print(f"render fetcher failed to start, continuing without it: {e!r}", file=sys.stderr)
+                    self.render = None
+            return self.render
+
+    async def visit(self, url, depth):
+        """Fetch + extract one URL (escalating to `render` if needed); returns (record, links to follow, text)."""
+        want_links = self.follow and (self.max_depth is None or depth < self.max_depth)
+        record, links, text = await self._process(self.fetcher, self.extractor, url, want_links)
+        render = await self._start_render() if self.render is not None and record["tokens"] < self.render_below else None
+        if render is not None:
+            rendered, rendered_links, rendered_text = await self._process(*render, url, want_links)
+            if rendered["tokens"] > record["tokens"]:
+                rendered.update(elapsed=round(record["elapsed"] + rendered["elapsed"], 4),
+                                bytes=record["bytes"] + rendered["bytes"], rendered=True)
+                record, links, text = rendered, rendered_links, rendered_text
+        return record, links if want_links else [], text
+
+    async def run(self, seeds):
+        self._started, self._start_lock = [], asyncio.Lock()
+        if self.extract_in == "process":
+            self._pool = ProcessPoolExecutor(self.extract_workers)
+        results, seqs, started, active, order = PageTable(self.text_store), array("q"), 0, 0, itertools.count()
+        frontier, changed = Frontier(bloom_capacity=self.bloom_capacity), asyncio.Condition()
+        for u in seeds:
+            frontier.add(u, (next(order), 0))
+        t0 = time.perf_counter()
+
+        async def worker():
+            nonlocal started, active
+            while True:
+                async with changed:
+                    await changed.wait_for(lambda: frontier or active == 0)
+                    if not frontier:
+                        return   # nothing queued and nothing in flight: the crawl is done
+                    url, (seq, depth) = frontier.pop()
+                    active += 1
+                try:
+                    # `started` counts reserved fetches, so in-flight work never overshoots max_pages
+                    if not self.allowed(url) or started >= self.max_pages: continue
+                    started += 1
+                    record, links, text = await self.visit(url, depth)
+                    with self.recorder.span("enqueue", url):
+                        for nxt in links:
+                            if self.allowed(nxt):
+                                frontier.add(nxt, (next(order), depth + 1))
+                    results.append(record, text, self.recorder.take_page(url))
+                    seqs.append(seq)
+                finally:
+                    async with changed:
+                        active -= 1
+                        changed.notify_all()
+
+        try:
+            await self._start(self.fetcher)
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            for f in self._started:
+                await f.close()
+            if self._pool is not None:
+                self._pool.shutdown()
+        elapsed = time.perf_counter() - t0
+        results.reorder(np.argsort(seqs, kind="stable"))
+        return results, elapsed
+
+    def crawl(self, seeds):
+        """Blocking wrapper around run()."""
+        return asyncio.run(self.run(seeds))
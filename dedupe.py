@@ -0,0 +1,154 @@
+# dedupe.py
+# Exact and near-duplicate page detection plus site-wide boilerplate stripping.
+import hashlib, re
+from collections import defaultdict
+
+WORD = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    return " ".join(WORD.findall(text.lower()))
+
+
+def text_hash(text):
+    """Hash of the normalized text (case, punctuation and whitespace insensitive)."""
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def line_key(line):
+    """Short hash of a stripped, lowercased line; what BoilerplateFilter counts."""
+    return hashlib.blake2b(line.strip().lower().encode("utf-8"), digest_size=8).hexdigest()
+
+
+def simhash(text, shingle=3, bits=64):
+    """64-bit SimHash over word `shingle`-grams."""
+    words = WORD.findall(text.lower())
+    grams = [" ".join(words[i:i + shingle]) for i in range(max(len(words) - shingle + 1, 1))]
+    v = [0] * bits
+    for g in grams:
+        h = int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little")
+        for i in range(bits):
+            v[i] += 1 if (h >> i) & 1 else -1
+    return sum(1 << i for i in range(bits) if v[i] > 0)
+
+
+class NearDuplicateIndex:
+    """SimHash index that finds any stored fingerprint within `max_distance` bits.
+
+    Fingerprints are split into `max_distance + 1` bands; by pigeonhole, a match
+    within the distance shares at least one band exactly, so only those buckets
+    are compared.
+    """
+
+    def __init__(self, max_distance=3, bits=64):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.width = bits // self.bands
+        self.buckets = [defaultdict(list) for _ in range(self.bands)]
+
+    def _keys(self, fp):
+        mask = (1 << self.width) - 1
+        return [(fp >> (b * self.width)) & mask for b in range(self.bands)]
+
+    def query(self, fp):
+        """Key of a stored near-duplicate of fp, or None."""
+        for b, key in enumerate(self._keys(fp)):
+            for other, ref in self.buckets[b].get(key, ()):
+                if bin(fp ^ other).count("1") <= self.max_distance:
+                    return ref
+        return None
+
+    def add(self, fp, ref):
+        for b, key in enumerate(self._keys(fp)):
+            self.buckets[b][key].append((fp, ref))
+
+
+class BoilerplateFilter:
+    """Learns lines (nav, header, footer, cookie banners...) that repeat across pages.
+
+    A line seen on at least `min_pages` distinct pages is treated as boilerplate
+    and stripped from every page processed afterwards. This is a single streaming
+    pass, so the first few pages of a crawl keep their boilerplate. Only pages
+    that are kept should be learned, or duplicates would inflate the counts.
+    Lines are counted by `line_key`, so the learned state is small enough to journal.
+    """
+
+    def __init__(self, min_pages=3, min_chars=3):
+        self.min_pages = min_pages
+        self.min_chars = min_chars
+        self.counts = defaultdict(int)
+
+    def strip(self, lines):
+        """Lines that are not (yet) known boilerplate; does not update the counts."""
+        return [line for line in lines
+                if len(line.strip()) < self.min_chars or self.counts.get(line_key(line), 0) < self.min_pages]
+
+    def learn(self, lines):
+        """Count each distinct line of one accepted page; returns the keys counted."""
+        keys = sorted({line_key(line) for line in lines if len(line.strip()) >= self.min_chars})
+        self.learn_keys(keys)
+        return keys
+
+    def learn_keys(self, keys):
+        for key in keys:
+            self.counts[key] += 1
+
+
+class PageDeduper:
+    """Per-crawl de-dup stage: boilerplate stripping, then exact and near-duplicate checks.
+
+    `check(url, lines)` returns (text, duplicate_of): `text` is the page's text
+    with boilerplate lines removed, and `duplicate_of` is the URL of an earlier
+    page with the same normalized text (exact) or a SimHash within
+    `max_distance` bits (near), else None. After an accepted page, `last`
+    holds everything it added to the indexes (hashes, SimHash, boilerplate line
+    keys); journaling it and passing it to `restore` on resume rebuilds the
+    exact same state as an uninterrupted run. It is None after a duplicate.
+    """
+
+    def __init__(self, max_distance=3, min_pages=3, strip_boilerplate=True):
+        self.boilerplate = BoilerplateFilter(min_pages) if strip_boilerplate else None
+        self.exact = {}
+        self.near = NearDuplicateIndex(max_distance)
+        self.stats = {"pages": 0, "exact_duplicates": 0, "near_duplicates": 0,
+                      "chars_in": 0, "chars_out": 0}
+        self.last = None
+
+    def index(self, url, text):
+        """Register an already-accepted page from its text alone (no boilerplate state)."""
+        self.exact.setdefault(text_hash(text), url)
+        self.near.add(simhash(text), url)
+
+    def restore(self, url, state):
+        """Replay the `last` state journaled for an accepted page."""
+        self.exact.setdefault(state["hash"], url)
+        self.exact.setdefault(state["raw_hash"], url)
+        self.near.add(state["simhash"], url)
+        if self.boilerplate is not None:
+            self.boilerplate.learn_keys(state["lines"])
+
+    def check(self, url, lines):
+        self.stats["pages"] += 1
+        self.last = None
+        raw_text = "\n".join(lines)
+        kept = self.boilerplate.strip(lines) if self.boilerplate is not None else lines
+        text = "\n".join(kept)
+        self.stats["chars_in"] += len(raw_text)
+        self.stats["chars_out"] += len(text)
+        # the raw hash catches identical pages even while boilerplate is still being learned
+        h, raw = text_hash(text), text_hash(raw_text)
+        for key in (h, raw):
+            if key in self.exact:
+                self.stats["exact_duplicates"] += 1
+                return text, self.exact[key]
+        fp = simhash(text)
+        match = self.near.query(fp)
+        if match is not None:
+            self.stats["near_duplicates"] += 1
+            return text, match
+        self.exact[h] = url
+        self.exact.setdefault(raw, url)
+        self.near.add(fp, url)
+        keys = self.boilerplate.learn(lines) if self.boilerplate is not None else []
+        self.last = {"hash": h, "raw_hash": raw, "simhash": fp, "lines": keys}
+        return text, None
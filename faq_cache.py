@@ -0,0 +1,146 @@
+# faq_cache.py
+# Answer the head of the query distribution straight from the scraped FAQ pairs:
+# exact match on the normalized question, then a cheap token-overlap match,
+# with an LRU/TTL cache of recent queries in front of both.
+import argparse, math, re, time
+from collections import OrderedDict, defaultdict
+
+WORD = re.compile(r"\w+")
+STOPWORDS = frozenset("""a an the is are am was were be been do does did i me my we our you your it its
+this that to of in on for with at by from and or can could would should will how what when where which
+who why please tell about there any""".split())
+
+
+def normalize_question(text):
+    """Lowercased word tokens without punctuation: "How do I get a refund?!" -> "how do i get a refund"."""
+    return " ".join(WORD.findall(text.lower()))
+
+
+def content_terms(text):
+    return {w for w in WORD.findall(text.lower()) if w not in STOPWORDS}
+
+
+class FaqAnswerCache:
+    """Lookup layer over {question, answer} pairs.
+
+    `lookup(query)` tries, in order: the recent-query cache (LRU, `max_entries`,
+    entries expire after `ttl` seconds), an exact match on the normalized
+    question, and an IDF-weighted overlap of content words against every FAQ
+    question sharing a term. A similar match needs `threshold`, at least
+    `min_shared` content words in common (one shared word such as "kyc" says
+    little about what is being asked), and a lead of `margin` over the next
+    best question; confusable questions ("turn on" vs "how does ... work")
+    are left to retrieval. It returns the matched pair plus `match`/`score`,
+    or None when retrieval should run instead.
+    """
+
+    def __init__(self, pairs=(), threshold=0.6, max_entries=1024, ttl=3600.0, min_shared=2, margin=0.1):
+        self.threshold = threshold
+        self.min_shared = min_shared
+        self.margin = margin
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.faqs, self.exact = [], {}
+        self.postings = defaultdict(list)
+        self._recent = OrderedDict()
+        self.stats = {"queries": 0, "cache_hits": 0, "exact_hits": 0, "similar_hits": 0, "ambiguous": 0, "misses": 0}
+        for pair in pairs:
+            self.add(pair)
+
+    @classmethod
+    def from_records(cls, records, **kwargs):
+        """Collect the `faqs` of KB / help-center records (url kept for citation)."""
+        pairs = ({"question": f["question"], "answer": f["answer"], "url": rec.get("url")}
+                 for rec in records for f in rec.get("faqs") or [] if f.get("question") and f.get("answer"))
+        return cls(pairs, **kwargs)
+
+    def add(self, pair):
+        key = normalize_question(pair["question"])
+        if not key or key in self.exact:
+            return
+        i = len(self.faqs)
+        self.faqs.append((pair, content_terms(pair["question"])))
+        self.exact[key] = i
+        for term in self.faqs[i][1]:
+            self.postings[term].append(i)
+        self._recent.clear()   # cached misses may now have an answer
+
+    def _idf(self, term):
+        return math.log(1 + len(self.faqs) / (1 + len(self.postings.get(term, ()))))
+
+    def _match(self, key, query):
+        if key in self.exact:
+            self.stats["exact_hits"] += 1
+            return dict(self.faqs[self.exact[key]][0], match="exact", score=1.0)
+        terms = content_terms(query)
+        candidates = {i for t in terms for i in self.postings.get(t, ())}
+        scored = []
+        for i in candidates:
+            other = self.faqs[i][1]
+            common = terms & other
+            shared = sum(self._idf(t) for t in common)
+            total = math.sqrt(sum(self._idf(t) for t in terms) * sum(self._idf(t) for t in other))
+            scored.append((shared / total if total else 0.0, len(common), i))
+        scored.sort(reverse=True)
+        if scored and scored[0][0] >= self.threshold and scored[0][1] >= self.min_shared:
+            best_score, _, best = scored[0]
+            if len(scored) > 1 and best_score - scored[1][0] < self.margin:
+                self.stats["ambiguous"] += 1
+            else:
+                self.stats["similar_hits"] += 1
+                return dict(self.faqs[best][0], match="similar", score=round(best_score, 4))
+        self.stats["misses"] += 1
+        return None
+
+    def lookup(self, query):
+        self.stats["queries"] += 1
+        key = normalize_question(query)
+        now = time.monotonic()
+        hit = self._recent.get(key)
+        if hit is not None and hit[0] > now:
+            self._recent.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            if hit[1] is None:
+                self.stats["misses"] += 1
+            return hit[1]
+        result = self._match(key, query)
+        self._recent[key] = (now + self.ttl, result)
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+        return result
+
+    def answer(self, query, fallback):
+        """FAQ answer when one matches, else `fallback(query)` (the retrieval path)."""
+        hit = self.lookup(query)
+        return hit if hit is not None else fallback(query)
+
+    def hit_rate(self):
+        answered = self.stats["queries"] - self.stats["misses"]
+        return answered / self.stats["queries"] if self.stats["queries"] else 0.0
+
+
+if __name__ == "__main__":
+    from rag_index import DEFAULT_INPUTS, RagIndex, iter_records, make_embedder
+    ap = argparse.ArgumentParser(description="Answer questions from scraped FAQs, falling back to the RAG index")
+    ap.add_argument("questions", nargs="+")
+    ap.add_argument("--inputs", nargs="*", default=DEFAULT_INPUTS)
+    ap.add_argument("--threshold", type=float, default=0.6)
+    ap.add_argument("--index-dir", default=None, help="rag_index directory used for questions the FAQs miss")
+    ap.add_argument("--embedder", default="hashing")
+    args = ap.parse_args()
+    cache = FaqAnswerCache.from_records(iter_records(args.inputs), threshold=args.threshold)
+    print(f"Loaded {len(cache.faqs)} FAQ pairs")
+    retrieve = lambda q: None
+    if args.index_dir:
+        idx, embedder = RagIndex.load(args.index_dir), make_embedder(args.embedder)
+        retrieve = lambda q: {"match": "retrieval", "chunks": [c for _, c in idx.hybrid_search(q, embedder, 3)]}
+    for q in args.questions:
+        result = cache.answer(q, retrieve)
+        if result is None:
+            print(f"? {q}\n  (no answer)")
+        elif result["match"] == "retrieval":
+            print(f"? {q}\n  [retrieval] " + " | ".join(c["url"] or "" for c in result["chunks"]))
+        else:
+            print(f"? {q}\n  [{result['match']} {result['score']}] {result['question']}\n  {result['answer'][:300]}")
+    print(f"FAQ hit rate: {cache.hit_rate():.1%}  {cache.stats}")
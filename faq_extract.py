@@ -1,16 +1,56 @@
 # faq_extract.py (expects HTML or innerText string `page_text`)
-import re
+import argparse, re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
-def extract_faq_pairs(page_text):
-    # naive pattern: lines starting with common question stems
-    qs = []
+DEFAULT_STEMS = ("what", "how", "why", "can", "does", "do", "is", "are")
+
+
+@lru_cache(maxsize=32)
+def question_pattern(stems=DEFAULT_STEMS):
+    """Compiled "line starts with a question stem" regex for a tuple of stems."""
+    return re.compile(r"(?i)(?:%s)\b" % "|".join(map(re.escape, stems)))
+
+
+def extract_faq_pairs(page_text, stems=DEFAULT_STEMS, max_answer_lines=11):
+    """Split the page's lines into question/answer segments in one pass.
+
+    Every line starting with a stem opens a question; its answer is the lines up
+    to the next question (at most `max_answer_lines`), so answers never overlap.
+    """
+    match = question_pattern(tuple(stems)).match
     lines = [l.strip() for l in page_text.splitlines() if l.strip()]
-    for i,l in enumerate(lines):
-        if re.match(r"(?i)^(what|how|why|can|does|do|is|are)\b", l):
-            # join following lines until next question or blank
-            ans = []
-            for j in range(i+1, min(i+12, len(lines))):
-                if re.match(r"(?i)^(what|how|why|can|does|do|is|are)\b", lines[j]): break
-                ans.append(lines[j])
-            qs.append({"question": l, "answer": " ".join(ans).strip()})
+    starts = [i for i, l in enumerate(lines) if match(l)]
+    qs = []
+    for i, nxt in zip(starts, starts[1:] + [len(lines)]):
+        ans = lines[i + 1:min(nxt, i + 1 + max_answer_lines)]
+        qs.append({"question": lines[i], "answer": " ".join(ans).strip()})
     return qs
+
+
+def _extract_one(args):
+    return extract_faq_pairs(*args)
+
+
+def extract_faq_pairs_batch(pages, stems=DEFAULT_STEMS, max_answer_lines=11, workers=None, chunksize=16):
+    """extract_faq_pairs over many page texts on a process pool; results keep input order."""
+    jobs = [(text, tuple(stems), max_answer_lines) for text in pages]
+    if workers == 1 or len(jobs) < 2 * chunksize:
+        return [_extract_one(job) for job in jobs]   # not worth the pool start-up
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_extract_one, jobs, chunksize=chunksize))
+
+
+if __name__ == "__main__":
+    from jsonl_store import read_records
+    ap = argparse.ArgumentParser(description="Mine question/answer pairs from crawled page text")
+    ap.add_argument("input", help="KB output (.jsonl parts or legacy .json)")
+    ap.add_argument("--stems", default=",".join(DEFAULT_STEMS), help="comma-separated question stems")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    records = [r for r in read_records(args.input) if r.get("content")]
+    stems = tuple(s.strip() for s in args.stems.split(",") if s.strip())
+    # scrape_all flattens whitespace, so split on sentence ends when a page has no newlines
+    texts = [r["content"] if "\n" in r["content"] else re.sub(r"(?<=[.?!])\s+", "\n", r["content"]) for r in records]
+    pairs = extract_faq_pairs_batch(texts, stems, workers=args.workers)
+    print(f"{sum(map(len, pairs))} question/answer pairs from {len(records)} pages")
@@ -0,0 +1,86 @@
+# fetch_tiers.py
+# Static-first fetching: decide per URL whether a plain HTTP fetch is enough or the
+# page needs a headless browser, and remember the answer per host and path prefix.
+import json, os, re
+from urllib.parse import urlparse
+
+STATIC, RENDER = "static", "render"
+# hosts whose pages are client-rendered shells; they go straight to the browser
+JS_HOSTS = {"jiopay.com", "www.jiopay.com"}
+# an empty framework mount point: the content only exists after the scripts run
+SPA_ROOT = re.compile(r"<(div|main|section)\b[^>]*\bid=[\"'](root|app|__next|__nuxt|___gatsby)[\"'][^>]*>\s*</\1>"
+                      r"|<app-root\b[^>]*>\s*</app-root>", re.I)
+NOSCRIPT_JS = re.compile(r"<noscript\b[^>]*>[^<]*(enable|requires?)\s+javascript", re.I)
+WORD = re.compile(r"\w+")
+
+
+def needs_render(html, text, min_words=50):
+    """Why a statically fetched page should be rendered instead ("spa_root",
+    "noscript", "low_text"), or None if its text can be used as-is."""
+    if SPA_ROOT.search(html):
+        return "spa_root"
+    words = len(WORD.findall(text))
+    if words < min_words and NOSCRIPT_JS.search(html):
+        return "noscript"
+    if words < min_words:
+        return "low_text"
+    return None
+
+
+class TierPolicy:
+    """Learned fetch tier per host and per host + first path segment, persisted as JSON.
+
+    `tier(url)` prefers the path-level decision, then the host-level one, then
+    `js_hosts`; anything unknown starts static. `learn(url, tier)` counts one
+    outcome for both keys; a key needs `min_evidence` renders, outnumbering its
+    static outcomes, before it is sent straight to the browser.
+    """
+
+    def __init__(self, path="fetch_tiers.json", js_hosts=JS_HOSTS, min_words=50, min_evidence=2):
+        self.path = path
+        self.js_hosts = set(js_hosts or ())
+        self.min_words = min_words
+        self.min_evidence = min_evidence
+        self.data = {}   # key -> {"static": n, "render": n}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data = json.load(f)
+        self.stats = {"static": 0, "escalated": 0, "rendered_direct": 0, "render_unhelpful": 0}
+
+    @staticmethod
+    def keys(url):
+        parts = urlparse(url)
+        host = (parts.hostname or "").lower()
+        segment = parts.path.strip("/").split("/", 1)[0]
+        return f"{host}/{segment}", host
+
+    def _decision(self, key):
+        counts = self.data.get(key)
+        if not counts:
+            return None
+        if counts.get(RENDER, 0) >= self.min_evidence and counts[RENDER] > counts.get(STATIC, 0):
+            return RENDER
+        return STATIC if counts.get(STATIC, 0) >= counts.get(RENDER, 0) else None
+
+    def tier(self, url):
+        path_key, host = self.keys(url)
+        decision = self._decision(path_key) or self._decision(host)
+        if decision is None:
+            decision = RENDER if host in self.js_hosts else STATIC
+        return decision
+
+    def needs_render(self, html, text):
+        return needs_render(html, text, self.min_words)
+
+    def learn(self, url, tier):
+        for key in self.keys(url):
+            counts = self.data.setdefault(key, {STATIC: 0, RENDER: 0})
+            counts[tier] += 1
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -0,0 +1,373 @@
+# fixture_server.py
+# Local stand-in for the live sites so crawls can be benchmarked offline:
+#   record     reverse proxy to the real hosts that saves every response to a WARC file
+#   replay     serves a recorded WARC corpus
+#   synthetic  generated site of any size / link fan-out
+# Every original host gets its own local port; pipelines pick the mapping up
+# from CRAWL_HOST_MAP (see remap_url / remap_hosts).
+import argparse, gzip, hashlib, json, mmap, os, random, re, threading, time, uuid, zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, urlunsplit
+from urllib.request import Request, build_opener, HTTPRedirectHandler
+from urllib.error import HTTPError
+from frontier import normalize_url
+
+HOST_MAP_ENV = "CRAWL_HOST_MAP"
+DEFAULT_HOSTS = ["www.jio.com", "jio.com", "jiopay.com", "www.jiopay.com"]
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "content-encoding", "content-length",
+               "proxy-connection", "upgrade", "te", "trailer"}
+REWRITE_TYPES = ("text/", "javascript", "json", "xml")
+SITEMAP_CHUNK = 10000
+
+
+# ---------------------------------------------------------------- host mapping
+
+def host_map(env=None):
+    """{original host: "127.0.0.1:port"} from CRAWL_HOST_MAP ("a.com=127.0.0.1:8801,b.com=...").
+
+    The crawl entry points pass their seeds and host allow-lists through
+    remap_url / remap_hosts at import time, so setting CRAWL_HOST_MAP points a
+    whole crawl at a local fixture_server instead of the live sites; with it
+    unset (the default) every URL is left alone. Records are meant to keep the
+    original URLs (unmap_url).
+    """
+    value = os.environ.get(HOST_MAP_ENV, "") if env is None else env
+    pairs = (item.split("=", 1) for item in value.split(",") if "=" in item)
+    return {host.strip().lower(): local.strip() for host, local in pairs}
+
+
+def format_host_map(mapping):
+    return ",".join(f"{host}={local}" for host, local in mapping.items())
+
+
+def remap_url(url, mapping=None):
+    """Point url at its local fixture host (http) when its host is mapped; otherwise unchanged."""
+    mapping = host_map() if mapping is None else mapping
+    parts = urlsplit(url)
+    local = mapping.get((parts.hostname or "").lower())
+    return urlunsplit(("http", local) + tuple(parts[2:])) if local else url
+
+
+def remap_hosts(hosts, mapping=None):
+    """Host allow-list with mapped hosts replaced by their local netlocs."""
+    mapping = host_map() if mapping is None else mapping
+    return {mapping.get(h, h) for h in hosts}
+
+
+def unmap_url(url, mapping=None):
+    """Inverse of remap_url: the original https URL for a local fixture URL."""
+    mapping = host_map() if mapping is None else mapping
+    parts = urlsplit(url)
+    for host, local in mapping.items():
+        if parts.netloc == local:
+            return urlunsplit(("https", host) + tuple(parts[2:]))
+    return url
+
+
+def rewrite_body(body, mapping):
+    """Replace absolute links to mapped hosts (https://h, http://h, //h) with their local netlocs."""
+    if not mapping:
+        return body
+    hosts = "|".join(re.escape(h) for h in sorted(mapping, key=len, reverse=True))
+    pattern = re.compile(rb"(?:https?:)?//(" + hosts.encode() + rb")(?=[/:\"'\s?#<)]|$)", re.I)
+    return pattern.sub(lambda m: b"http://" + mapping[m.group(1).decode().lower()].encode(), body)
+
+
+# ---------------------------------------------------------------- WARC corpus
+
+class WarcWriter:
+    """Appends WARC/1.0 `response` records, one gzip member each (readable by standard WARC tools)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._f = open(path, "ab")
+        self._lock = threading.Lock()
+
+    def write(self, url, status, reason, headers, body):
+        http = f"HTTP/1.1 {status} {reason}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers) + "\r\n"
+        block = http.encode("latin-1", "replace") + body
+        head = ("WARC/1.0\r\nWARC-Type: response\r\n"
+                f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+                f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}\r\n"
+                f"WARC-Target-URI: {url}\r\n"
+                "Content-Type: application/http;msgtype=response\r\n"
+                f"Content-Length: {len(block)}\r\n\r\n").encode("utf-8")
+        member = gzip.compress(head + block + b"\r\n\r\n")
+        with self._lock:
+            self._f.write(member)
+            self._f.flush()
+            self.records += 1
+
+    def close(self):
+        self._f.close()
+
+
+def parse_warc_record(data):
+    """(url, status, headers, body) of a response record, or None for other record types."""
+    head, _, rest = data.partition(b"\r\n\r\n")
+    fields = dict(line.split(": ", 1) for line in head.decode("utf-8", "replace").split("\r\n")[1:] if ": " in line)
+    if fields.get("WARC-Type") != "response":
+        return None
+    block = rest[:int(fields["Content-Length"])]
+    http_head, _, body = block.partition(b"\r\n\r\n")
+    lines = http_head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = [tuple(line.split(": ", 1)) for line in lines[1:] if ": " in line]
+    return fields["WARC-Target-URI"], status, headers, body
+
+
+def iter_warc(path, chunk=1 << 20):
+    """Yield (offset, length, decompressed record) per gzip member; stops at a truncated or corrupt tail."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        pos = 0
+        while pos < len(data):
+            d, out, p = zlib.decompressobj(31), [], pos
+            try:
+                while not d.eof and p < len(data):
+                    piece = data[p:p + chunk]
+                    out.append(d.decompress(piece))
+                    p += len(piece)
+            except zlib.error:
+                break   # corrupt tail (e.g. recorder killed mid-write)
+            if not d.eof:
+                break
+            end = p - len(d.unused_data)
+            yield pos, end - pos, b"".join(out)
+            pos = end
+
+
+class WarcCorpus:
+    """Offset index over a WARC file: responses are read back on demand, the last capture of a URL wins."""
+
+    def __init__(self, path):
+        self.path = path
+        self.index, self.hosts = {}, set()
+        for offset, length, data in iter_warc(path):
+            rec = parse_warc_record(data)
+            if rec:
+                self.index[normalize_url(rec[0])] = (offset, length)
+                self.hosts.add((urlsplit(rec[0]).hostname or "").lower())
+        self._fd = os.open(path, os.O_RDONLY)
+
+    def get(self, url):
+        entry = self.index.get(normalize_url(url))
+        if entry is None:
+            return None
+        return parse_warc_record(gzip.decompress(os.pread(self._fd, entry[1], entry[0])))
+
+
+# ---------------------------------------------------------------- synthetic site
+
+WORDS = ("payment upi autopay refund merchant wallet settlement kyc onboarding account bank card "
+         "charge dispute invoice gateway checkout link qr code business customer transaction limit "
+         "fee report dashboard api integration webhook security compliance support").split()
+
+
+class SyntheticSite:
+    """Deterministic site of `pages` pages (/p/<i>.html) with `fanout` links each.
+
+    Page i links to its children i*fanout+1..i*fanout+fanout (so a BFS from the
+    home page reaches everything) plus a few seeded random pages. Every page
+    shares the same nav/footer and carries two FAQ items; /robots.txt points at
+    /sitemap.xml (an index when there are more than SITEMAP_CHUNK pages).
+    """
+
+    def __init__(self, pages=1000, fanout=8, seed=0):
+        self.pages, self.fanout, self.seed = pages, fanout, seed
+
+    def _words(self, rng, n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    def page(self, i):
+        rng = random.Random(self.seed * 1000003 + i)
+        children = [c for c in range(i * self.fanout + 1, i * self.fanout + self.fanout + 1) if c < self.pages]
+        extra = [rng.randrange(self.pages) for _ in range(2)]
+        links = "".join(f'<li><a href="/p/{c}.html">{self._words(rng, 3)}</a></li>' for c in children + extra)
+        paras = "".join(f"<p>{self._words(rng, rng.randint(30, 80))}.</p>" for _ in range(rng.randint(3, 8)))
+        faqs = "".join(f'<div class="faq-item"><h3>How does {self._words(rng, 2)} work?</h3>'
+                       f"<p>{self._words(rng, 20)}.</p></div>" for _ in range(2))
+        title = f"Page {i}: {self._words(rng, 3)}"
+        return (f"<!doctype html><html><head><title>{title}</title><script>var x = {i};</script></head><body>"
+                '<nav><a href="/">Home</a> <a href="/p/1.html">Products</a> <a href="/p/2.html">Help</a></nav>'
+                f"<main><h1>{title}</h1>{paras}<section>{faqs}</section><ul>{links}</ul></main>"
+                "<footer>Copyright Synthetic Payments Ltd. All rights reserved.</footer></body></html>").encode("utf-8")
+
+    def sitemap(self, base, part=None):
+        if part is None and self.pages > SITEMAP_CHUNK:
+            parts = range((self.pages + SITEMAP_CHUNK - 1) // SITEMAP_CHUNK)
+            items = "".join(f"<sitemap><loc>{base}/sitemap-{k}.xml</loc></sitemap>" for k in parts)
+            return f'<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{items}</sitemapindex>'.encode()
+        lo = (part or 0) * SITEMAP_CHUNK
+        items = "".join(f"<url><loc>{base}/p/{i}.html</loc><lastmod>2024-01-01</lastmod></url>"
+                        for i in range(lo, min(lo + SITEMAP_CHUNK, self.pages)))
+        return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{items}</urlset>'.encode()
+
+    def respond(self, path, base):
+        """(status, headers, body) for a request path; unknown paths render the home page."""
+        path = path.split("?", 1)[0]
+        if path == "/robots.txt":
+            return 200, [("Content-Type", "text/plain")], f"User-agent: *\nAllow: /\nSitemap: {base}/sitemap.xml\n".encode()
+        m = re.fullmatch(r"/sitemap(?:-(\d+))?\.xml", path)
+        if m:
+            return 200, [("Content-Type", "application/xml")], self.sitemap(base, int(m.group(1)) if m.group(1) else None)
+        m = re.fullmatch(r"/p/(\d+)\.html", path)
+        i = int(m.group(1)) if m else 0
+        if i >= self.pages:
+            return 404, [("Content-Type", "text/html")], b"<html><body>Not found</body></html>"
+        body = self.page(i)
+        return 200, [("Content-Type", "text/html; charset=utf-8"), ("ETag", f'"{self.seed}-{i}"')], body
+
+
+# ---------------------------------------------------------------- server
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "fixture/1.0"
+    disable_nagle_algorithm = True   # headers and body go out as separate writes
+    host = None       # original host this port stands in for
+    fixture = None    # the FixtureServer
+
+    def do_GET(self):
+        status, headers, body = self.fixture.respond(self.host, self.path, self.headers)
+        delay = self.fixture.delay(self.host, self.path)
+        if delay:
+            time.sleep(delay)
+        etag = dict((k.lower(), v) for k, v in headers).get("etag")
+        if etag and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        self.send_response(status)
+        for k, v in headers:
+            if k.lower() not in HOP_HEADERS:
+                self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer:
+    """One ThreadingHTTPServer per original host on consecutive ports from `base_port`.
+
+    `mode` is "record" (proxy to https://<host> and append to `warc`),
+    "replay" (serve `corpus`) or "synthetic" (serve `site`). Every response
+    waits latency_ms +/- jitter_ms, derived deterministically from the path.
+    """
+
+    def __init__(self, mode, hosts, base_port=8800, bind="127.0.0.1", corpus=None, warc=None, site=None,
+                 latency_ms=0, jitter_ms=0):
+        self.mode, self.corpus, self.warc, self.site = mode, corpus, warc, site
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self.mapping = {h: f"{bind}:{base_port + i}" for i, h in enumerate(hosts)}
+        self._opener = build_opener(_NoRedirect)
+        self._servers = []
+        for host, local in self.mapping.items():
+            handler = type("Handler", (FixtureHandler,), {"host": host, "fixture": self})
+            self._servers.append(ThreadingHTTPServer((bind, int(local.rsplit(":", 1)[1])), handler))
+
+    def delay(self, host, path):
+        if not (self.latency_ms or self.jitter_ms):
+            return 0.0
+        h = int.from_bytes(hashlib.blake2b(f"{host}{path}".encode(), digest_size=4).digest(), "little")
+        jitter = (h / 0xFFFFFFFF * 2 - 1) * self.jitter_ms
+        return max(self.latency_ms + jitter, 0) / 1000
+
+    def respond(self, host, path, request_headers):
+        base = f"http://{self.mapping[host]}"
+        if self.mode == "synthetic":
+            return self.site.respond(path, base)
+        url = f"https://{host}{path}"
+        if self.mode == "replay":
+            rec = self.corpus.get(url)
+            if rec is None:
+                return 404, [("Content-Type", "text/plain")], b"not in corpus"
+            _, status, headers, body = rec
+        else:
+            status, reason, headers, body = self._fetch(url, request_headers)
+            self.warc.write(url, status, reason, headers, body)
+        return status, self._rewrite_headers(headers), self._rewrite(headers, body)
+
+    def _fetch(self, url, request_headers):
+        # conditional headers are dropped so the corpus always holds full bodies
+        fwd = {k: v for k, v in request_headers.items()
+               if k.lower() in ("user-agent", "accept", "accept-language", "cookie")}
+        try:
+            with self._opener.open(Request(url, headers=fwd), timeout=30) as r:
+                return r.status, r.reason, [h for h in r.getheaders() if h[0].lower() not in HOP_HEADERS], r.read()
+        except HTTPError as e:
+            return e.code, e.reason, [h for h in e.headers.items() if h[0].lower() not in HOP_HEADERS], e.read()
+
+    def _rewrite_headers(self, headers):
+        return [(k, remap_url(v, self.mapping) if k.lower() == "location" else v) for k, v in headers]
+
+    def _rewrite(self, headers, body):
+        ctype = dict((k.lower(), v) for k, v in headers).get("content-type", "")
+        return rewrite_body(body, self.mapping) if any(t in ctype for t in REWRITE_TYPES) else body
+
+    def start(self):
+        for srv in self._servers:
+            threading.Thread(target=srv.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for srv in self._servers:
+            srv.shutdown()
+            srv.server_close()
+        if self.warc is not None:
+            self.warc.close()
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    """Record redirects as they are instead of following them."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Offline fixture server for crawl benchmarks")
+    ap.add_argument("mode", choices=["record", "replay", "synthetic"])
+    ap.add_argument("--warc", default="corpus.warc.gz", help="WARC file to write (record) or serve (replay)")
+    ap.add_argument("--hosts", nargs="*", default=None, help=f"hosts to stand in for (default: {' '.join(DEFAULT_HOSTS)})")
+    ap.add_argument("--base-port", type=int, default=8800)
+    ap.add_argument("--bind", default="127.0.0.1")
+    ap.add_argument("--pages", type=int, default=10000, help="synthetic site size")
+    ap.add_argument("--fanout", type=int, default=8, help="links per synthetic page")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    ap.add_argument("--jitter-ms", type=float, default=0)
+    ap.add_argument("--host-map-file", default=None, help="also write the CRAWL_HOST_MAP value to this file")
+    args = ap.parse_args()
+    corpus = warc = site = None
+    hosts = args.hosts or DEFAULT_HOSTS
+    if args.mode == "replay":
+        corpus = WarcCorpus(args.warc)
+        hosts = args.hosts or sorted(corpus.hosts | set(DEFAULT_HOSTS))
+        print(f"Loaded {len(corpus.index)} responses from {args.warc}")
+    elif args.mode == "record":
+        warc = WarcWriter(args.warc)
+    else:
+        site = SyntheticSite(args.pages, args.fanout, args.seed)
+    server = FixtureServer(args.mode, hosts, args.base_port, args.bind, corpus, warc, site,
+                           args.latency_ms, args.jitter_ms).start()
+    value = format_host_map(server.mapping)
+    if args.host_map_file:
+        with open(args.host_map_file, "w") as f:
+            f.write(value + "\n")
+    print(json.dumps(server.mapping, indent=2))
+    print(f"export {HOST_MAP_ENV}='{value}'")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        if warc is not None:
+            print(f"Recorded {warc.records} responses to {args.warc}")
@@ -0,0 +1,135 @@
+# frontier.py
+# Crawl frontier shared by the pipelines: canonical URLs, enqueue-time de-dup, O(1) dequeue.
+import hashlib, heapq, itertools, math
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "dclid", "yclid", "mc_cid", "mc_eid", "_ga", "_gl", "ref", "ref_src"}
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def normalize_url(url, strip_trailing_slash=True):
+    """Canonical form used for de-dup: lowercase scheme/host, no default port,
+    no fragment, no tracking params (utm_* etc.), sorted query, no trailing slash."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and str(parts.port) != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if strip_trailing_slash and len(path) > 1:
+        path = path.rstrip("/") or "/"
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS]
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+def load_url_list(path):
+    """URLs from a text file, one per line; blank lines and # comments are skipped."""
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter for very large seen-sets (false positives only)."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        new = False
+        for p in self._positions(key):
+            if not self.bits[p >> 3] & (1 << (p & 7)):
+                self.bits[p >> 3] |= 1 << (p & 7)
+                new = True
+        self.count += new
+        return new
+
+    def __len__(self):
+        return self.count
+
+
+class SeenSet:
+    """Normalized-URL membership set; pass `bloom_capacity` to trade exactness for memory."""
+
+    def __init__(self, urls=(), normalize=True, bloom_capacity=None, error_rate=0.001):
+        self.normalize = normalize
+        self._keys = BloomFilter(bloom_capacity, error_rate) if bloom_capacity else set()
+        for u in urls:
+            self.add(u)
+
+    def key(self, url):
+        return normalize_url(url) if self.normalize else url
+
+    def __contains__(self, url):
+        return self.key(url) in self._keys
+
+    def add(self, url):
+        """Mark url as seen; returns True if it was new."""
+        k = self.key(url)
+        if k in self._keys:
+            return False
+        self._keys.add(k)
+        return True
+
+    def update(self, urls):
+        for u in urls:
+            self.add(u)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class Frontier:
+    """FIFO (or priority, lowest first) queue that drops already-seen URLs at enqueue time.
+
+    De-dup uses the normalized key, so the queue never holds more entries than
+    there are unique pages, but each URL is queued (and later fetched) exactly
+    as it was linked: normalization may drop a trailing slash or a query
+    parameter the server actually cares about.
+    """
+
+    def __init__(self, urls=(), priority=False, normalize=True, bloom_capacity=None, error_rate=0.001):
+        self.seen = SeenSet(normalize=normalize, bloom_capacity=bloom_capacity, error_rate=error_rate)
+        self.priority = priority
+        self._q = [] if priority else deque()
+        self._tie = itertools.count()
+        for u in urls:
+            self.add(u)
+
+    def add(self, url, item=None, priority=0):
+        """Enqueue url (with an optional payload) unless seen; returns True if queued."""
+        if not self.seen.add(url):
+            return False
+        if self.priority:
+            heapq.heappush(self._q, (priority, next(self._tie), url, item))
+        else:
+            self._q.append((url, item))
+        return True
+
+    def pop(self):
+        """Next (url, item); raises IndexError when empty."""
+        if self.priority:
+            _, _, url, item = heapq.heappop(self._q)
+            return url, item
+        return self._q.popleft()
+
+    def __len__(self):
+        return len(self._q)
+
+    def __bool__(self):
+        return bool(self._q)
+
+    def __contains__(self, url):
+        return url in self.seen
@@ -0,0 +1,96 @@
+# html_extract.py
+# Single-parse page extraction: text, title, FAQs and links from one DOM build.
+from collections import namedtuple
+from urllib.parse import urljoin
+
+PageContent = namedtuple("PageContent", "text title faqs links")
+
+# Adjust selectors based on actual FAQ HTML structure
+FAQ_ITEM = "div.faq-item, div[data-faq]"
+FAQ_QUESTION = "h3, .faq-question"
+FAQ_ANSWER = "p, .faq-answer"
+DROP_TAGS = ["script", "style", "noscript", "svg"]
+
+BACKENDS = ("selectolax", "lxml", "html.parser")
+
+
+def _installed(backend):
+    try:
+        if backend == "selectolax":
+            import selectolax.parser  # noqa: F401
+        elif backend == "lxml":
+            import lxml  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def best_backend():
+    """Fastest parser available here; html.parser always works."""
+    return next(b for b in BACKENDS if _installed(b))
+
+
+DEFAULT_BACKEND = best_backend()
+
+
+def _resolve(base_url, hrefs):
+    links, seen = [], set()
+    for href in hrefs:
+        try:
+            full = (urljoin(base_url, href) if base_url else href).split("#")[0]
+        except ValueError:   # e.g. "http://[broken": drop the link, keep the page
+            continue
+        if full and full not in seen:
+            seen.add(full)
+            links.append(full)
+    return links
+
+
+def _extract_selectolax(html, base_url):
+    from selectolax.parser import HTMLParser
+    tree = HTMLParser(html)
+    title_node = tree.css_first("title")
+    title = title_node.text(strip=True) if title_node else None
+    faqs = []
+    for item in tree.css(FAQ_ITEM):
+        q, a = item.css_first(FAQ_QUESTION), item.css_first(FAQ_ANSWER)
+        if q and a:
+            faqs.append({"question": q.text(strip=True), "answer": a.text(strip=True)})
+    links = _resolve(base_url, (a.attributes.get("href") for a in tree.css("a[href]")))
+    tree.strip_tags(DROP_TAGS)
+    root = tree.root
+    text = root.text(separator="\n", strip=True) if root else ""
+    return PageContent(text, title, faqs, links)
+
+
+def _extract_bs4(html, base_url, parser):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, parser)
+    title_tag = soup.find("title")
+    title = title_tag.get_text(strip=True) if title_tag else None
+    faqs = []
+    for item in soup.select(FAQ_ITEM):
+        q, a = item.select_one(FAQ_QUESTION), item.select_one(FAQ_ANSWER)
+        if q and a:
+            faqs.append({"question": q.get_text(strip=True), "answer": a.get_text(strip=True)})
+    links = _resolve(base_url, (a["href"] for a in soup.find_all("a", href=True)))
+    for tag in soup(DROP_TAGS):
+        tag.decompose()
+    text = soup.get_text("\n", strip=True)
+    return PageContent(text, title, faqs, links)
+
+
+def extract_page(html, base_url=None, backend=None):
+    """Parse `html` once and return PageContent(text, title, faqs, links).
+
+    `text` is newline-separated with script/style/noscript/svg removed, `title`
+    is None when the page has no <title>, and `links` are absolute, fragment-free
+    and de-duplicated in document order. `backend` is one of BACKENDS; an
+    unavailable backend falls back to html.parser.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend != "html.parser" and not _installed(backend):
+        backend = "html.parser"
+    if backend == "selectolax":
+        return _extract_selectolax(html, base_url)
+    return _extract_bs4(html, base_url, backend)
@@ -0,0 +1,145 @@
+# http_cache.py
+# On-disk conditional-request cache (ETag / Last-Modified) shared by the HTTP fetchers.
+import json, re, sqlite3, threading, time, zlib
+from frontier import normalize_url
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT,
+    status INTEGER,
+    headers TEXT,
+    body BLOB,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER,
+    stored_at REAL,
+    last_access REAL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access);
+"""
+
+
+class HttpCache:
+    """SQLite-backed response cache keyed by normalized URL, bounded by `max_bytes` (LRU).
+
+    Only 200 responses carrying a validator are stored. Callers send
+    `conditional_headers(url)` and, on a 304, serve `revalidated(url)` instead
+    of the (empty) network body. `stats` counts:
+      hits           304s answered from the cache
+      misses         full downloads (no entry, or the page changed)
+      revalidations  conditional requests sent
+    """
+
+    def __init__(self, path="http_cache.sqlite", max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self.stats = {"hits": 0, "misses": 0, "revalidations": 0, "stores": 0, "evictions": 0}
+
+    def key(self, url):
+        return normalize_url(url)
+
+    def _row(self, url):
+        return self._db.execute(
+            "SELECT status, headers, body, etag, last_modified FROM entries WHERE key = ?",
+            (self.key(url),)).fetchone()
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since for url, or {} if nothing is cached."""
+        with self._lock:
+            row = self._db.execute("SELECT etag, last_modified FROM entries WHERE key = ?",
+                                   (self.key(url),)).fetchone()
+            if not row:
+                return {}
+            self.stats["revalidations"] += 1
+        headers = {}
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def revalidated(self, url):
+        """Cached (status, headers, body) after a 304, or None if the entry was evicted meanwhile."""
+        with self._lock:
+            row = self._row(url)
+            if not row:
+                return None
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), self.key(url)))
+            self._db.commit()
+            self.stats["hits"] += 1
+        return row[0], json.loads(row[1]), zlib.decompress(row[2])
+
+    def store(self, url, status, headers, body):
+        """Record a full response; anything but a 200 with ETag/Last-Modified is just counted as a miss."""
+        headers = {k.lower(): v for k, v in dict(headers).items()}
+        etag, last_modified = headers.get("etag"), headers.get("last-modified")
+        with self._lock:
+            self.stats["misses"] += 1
+            if status != 200 or not (etag or last_modified):
+                return
+            packed = zlib.compress(body)
+            key, now = self.key(url), time.time()
+            old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._total -= old[0] if old else 0
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, status, json.dumps(headers), packed, etag, last_modified, len(packed), now, now))
+            self._total += len(packed)
+            self.stats["stores"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        while self._total > self.max_bytes:
+            row = self._db.execute("SELECT key, size FROM entries ORDER BY last_access LIMIT 1").fetchone()
+            if not row:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            self._total -= row[1]
+            self.stats["evictions"] += 1
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def decode_body(body, content_type=""):
+    """Decode a cached body using the Content-Type charset (utf-8 otherwise)."""
+    m = re.search(r"charset=([\w-]+)", content_type or "", re.I)
+    try:
+        return body.decode(m.group(1) if m else "utf-8", "replace")
+    except LookupError:
+        return body.decode("utf-8", "replace")
+
+
+def cached_get(url, cache=None, session=None, headers=None, timeout=20):
+    """`requests.get` that revalidates through `cache`; a 304 comes back as the cached 200 response."""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    getter = session or requests
+    req_headers = dict(headers or {})
+    if cache is not None:
+        req_headers.update(cache.conditional_headers(url))
+    r = getter.get(url, headers=req_headers, timeout=timeout)
+    if cache is None:
+        return r
+    if r.status_code == 304:
+        hit = cache.revalidated(url)
+        if hit is not None:
+            status, cached_headers, body = hit
+            r.status_code = status
+            r.headers = CaseInsensitiveDict(cached_headers)
+            r._content = body
+            r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+            r.from_cache = True
+            return r
+        # entry vanished between the two calls: fetch it unconditionally
+        r = getter.get(url, headers=headers, timeout=timeout)
+    cache.store(url, r.status_code, r.headers, r.content)
+    r.from_cache = False
+    return r
@@ -0,0 +1,154 @@
+# instrumentation.py
+# Lightweight per-stage timing for the crawl pipelines: spans on a monotonic
+# clock, per-URL stage timings handed to the caller, per-run histograms and a
+# bytes counter, exported to the report JSON or the Prometheus text format.
+import asyncio, functools, threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# histogram upper bounds in seconds (Prometheus-style, cumulative)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Recorder:
+    """Collects stage durations (seconds) as fixed-size histograms, plus a byte counter.
+
+    `span(stage, url)` is a context manager, `timed(stage)` a decorator for
+    plain or async functions, and `observe` records a duration measured
+    elsewhere (e.g. in a worker process). Memory does not grow with the number
+    of pages: each stage keeps bucket counts, sum and max only, and per-URL
+    timings are held just until the caller collects them with `take_page(url)`
+    (the crawl engine stores them in its PageTable). Safe to share between threads.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.stages = {}    # stage -> [counts per bucket (+Inf last), sum, max]
+        self.pending = {}   # url -> {stage: seconds} until take_page
+        self.bytes_total = 0
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds, url=None):
+        with self._lock:
+            h = self.stages.get(stage)
+            if h is None:
+                h = self.stages[stage] = [[0] * (len(self.buckets) + 1), 0.0, 0.0]
+            h[0][bisect_left(self.buckets, seconds)] += 1
+            h[1] += seconds
+            h[2] = max(h[2], seconds)
+            if url is not None:
+                stages = self.pending.setdefault(url, {})
+                stages[stage] = stages.get(stage, 0.0) + seconds
+
+    def add_bytes(self, n):
+        with self._lock:
+            self.bytes_total += n
+
+    @contextmanager
+    def span(self, stage, url=None):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t, url)
+
+    def timed(self, stage):
+        def decorate(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def wrapper(*args, **kwargs):
+                    with self.span(stage):
+                        return await fn(*args, **kwargs)
+            else:
+                @functools.wraps(fn)
+                def wrapper(*args, **kwargs):
+                    with self.span(stage):
+                        return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def take_page(self, url):
+        """Stage timings recorded for one URL, forgotten by the recorder afterwards."""
+        with self._lock:
+            return self.pending.pop(url, {})
+
+    def histograms(self):
+        """{stage: {count, sum_s, mean_s, p50_s, p95_s, max_s, buckets}} with cumulative bucket
+        counts; the quantiles are interpolated within buckets, as Prometheus' histogram_quantile does."""
+        out = {}
+        with self._lock:
+            items = [(stage, list(h[0]), h[1], h[2]) for stage, h in self.stages.items()]
+        for stage, counts, total, top in items:
+            n = sum(counts)
+            cumulative, running = [], 0
+            for c in counts[:-1]:
+                running += c
+                cumulative.append(running)
+            out[stage] = {
+                "count": n,
+                "sum_s": round(total, 6),
+                "mean_s": round(total / n, 6),
+                "p50_s": round(self._quantile(counts, 0.50, top), 6),
+                "p95_s": round(self._quantile(counts, 0.95, top), 6),
+                "max_s": round(top, 6),
+                "buckets": dict(zip(map(str, self.buckets), cumulative)),
+            }
+        return out
+
+    def _quantile(self, counts, q, top):
+        rank, running, lower = q * sum(counts), 0, 0.0
+        for upper, c in zip(self.buckets + (top,), counts):
+            upper = min(upper, top)
+            if c and running + c >= rank:
+                return lower + (upper - lower) * (rank - running) / c
+            running, lower = running + c, upper
+        return top
+
+    def prometheus(self, pipeline, prefix="crawl"):
+        """Prometheus text exposition: one histogram per stage plus a bytes counter."""
+        lines = [f"# HELP {prefix}_stage_seconds Time spent per crawl stage.",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, h in self.histograms().items():
+            labels = f'pipeline="{pipeline}",stage="{stage}"'
+            for le, count in h["buckets"].items():
+                lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{{labels},le="+Inf"}} {h["count"]}')
+            lines.append(f"{prefix}_stage_seconds_sum{{{labels}}} {h['sum_s']}")
+            lines.append(f"{prefix}_stage_seconds_count{{{labels}}} {h['count']}")
+        lines += [f"# HELP {prefix}_bytes_total Response bytes fetched.",
+                  f"# TYPE {prefix}_bytes_total counter",
+                  f'{prefix}_bytes_total{{pipeline="{pipeline}"}} {self.bytes_total}']
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, pipeline):
+        with open(path, "w") as f:
+            f.write(self.prometheus(pipeline))
+
+
+
+def connection_trace_config():
+    """aiohttp TraceConfig that stores DNS and new-connection setup times in the request's trace context.
+
+    Pass `trace_request_ctx={}` to session.get; afterwards the dict holds "dns"
+    and "connect" (seconds, connect including dns) when a new connection was opened.
+    """
+    import aiohttp
+
+    def start(key):
+        async def on_start(session, ctx, params):
+            setattr(ctx, key, time.perf_counter())
+        return on_start
+
+    def end(key, field):
+        async def on_end(session, ctx, params):
+            t = getattr(ctx, key, None)
+            if t is not None and isinstance(ctx.trace_request_ctx, dict):
+                ctx.trace_request_ctx[field] = time.perf_counter() - t
+        return on_end
+
+    tc = aiohttp.TraceConfig()
+    tc.on_dns_resolvehost_start.append(start("_dns"))
+    tc.on_dns_resolvehost_end.append(end("_dns", "dns"))
+    tc.on_connection_create_start.append(start("_connect"))
+    tc.on_connection_create_end.append(end("_connect", "connect"))
+    return tc
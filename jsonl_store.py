@@ -0,0 +1,106 @@
+# jsonl_store.py
+# Streaming JSONL output for knowledge-base records: one record per line, optional
+# gzip/zstd compression and size-based rotation, plus a matching reader.
+import glob, gzip, io, json, os, re
+
+SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def _open_write(path, compression, append):
+    mode = "ab" if append else "wb"
+    if compression == "gzip":
+        return io.TextIOWrapper(gzip.open(path, mode), encoding="utf-8")
+    if compression == "zstd":
+        import zstandard  # optional dependency
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(path, mode)), encoding="utf-8")
+    return open(path, mode[0], encoding="utf-8")
+
+
+def _open_read(path):
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8")
+    if path.endswith(".zst"):
+        import zstandard  # optional dependency
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+class JsonlWriter:
+    """Append records to `path` (e.g. "kb.jsonl") as they are produced.
+
+    `compression` is None, "gzip" or "zstd" (adds .gz/.zst). With `rotate_bytes`,
+    output goes to numbered parts (kb.00000.jsonl, kb.00001.jsonl, ...) and a new
+    part starts once the current one has taken that many uncompressed bytes.
+    Each record is flushed as it is written, so readers can follow along.
+    """
+
+    def __init__(self, path, compression=None, rotate_bytes=None, append=False):
+        if compression not in SUFFIXES:
+            raise ValueError(f"unknown compression {compression!r}")
+        self.path = path
+        self.compression = compression
+        self.rotate_bytes = rotate_bytes
+        self.append = append
+        self.records = 0
+        self._part = 0
+        self._f = None
+        self._written = 0
+        if not append:
+            for old in part_paths(path):
+                os.remove(old)
+        elif rotate_bytes:
+            self._part = max(len(part_paths(path)) - 1, 0)
+
+    def _current_path(self):
+        if not self.rotate_bytes:
+            return self.path + SUFFIXES[self.compression]
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}.{self._part:05d}{ext}{SUFFIXES[self.compression]}"
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        size = len(line.encode("utf-8"))   # ensure_ascii=False: characters != bytes
+        if self._f is None:
+            self._f = _open_write(self._current_path(), self.compression, self.append)
+        elif self.rotate_bytes and self._written + size > self.rotate_bytes and self._written:
+            self._f.close()
+            self._part += 1
+            self._written = 0
+            self._f = _open_write(self._current_path(), self.compression, False)
+        self._f.write(line)
+        self._f.flush()
+        self._written += size
+        self.records += 1
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def part_paths(path):
+    """Every file a JsonlWriter for `path` may have produced, in write order."""
+    stem, ext = os.path.splitext(path)
+    parts = sorted(p for p in glob.glob(glob.escape(stem) + ".*" + ext + "*")
+                   if re.search(r"\.\d{5}" + re.escape(ext) + r"(\.gz|\.zst)?$", p))
+    singles = [path + s for s in SUFFIXES.values() if os.path.exists(path + s)]
+    return singles + parts
+
+
+def read_records(path):
+    """Yield records from a JSONL output (all parts, any compression) or a legacy JSON array file."""
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+    for p in part_paths(path):
+        with _open_read(p) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,109 @@
+# page_loading.py
+# Shared Playwright page-load policy: request blocking + a lighter readiness wait than networkidle.
+# Works with both the sync API (scrape_all, scrape_help_center) and the async API (pipeline_c).
+from urllib.parse import urlparse
+
+BLOCK_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCK_HOSTS = {
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "clarity.ms", "segment.io",
+    "mixpanel.com", "newrelic.com", "nr-data.net", "moengage.com", "branch.io", "appsflyer.com",
+}
+# SPA shells fire DOMContentLoaded before rendering, so also wait for some visible text
+READY_JS = "n => !!document.body && document.body.innerText.trim().length >= n"
+
+
+def _host_matches(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class LoadPolicy:
+    """What to block and when a page counts as loaded.
+
+    Requests whose resource type is in `block_types`, or whose host is (a
+    subdomain of) `block_hosts`, are aborted. With `first_party` set and
+    `block_third_party=True`, every other host is aborted too. `goto` waits for
+    `wait_until` (default DOMContentLoaded), then for `ready_selector` if given,
+    else for at least `min_text` characters of body text; a readiness timeout
+    is not an error, the page is used as-is.
+    """
+
+    def __init__(self, block_types=BLOCK_RESOURCE_TYPES, block_hosts=BLOCK_HOSTS, first_party=(),
+                 block_third_party=False, wait_until="domcontentloaded", ready_selector=None,
+                 min_text=50, ready_timeout=10000):
+        self.block_types = set(block_types or ())
+        self.block_hosts = set(block_hosts or ())
+        self.first_party = {urlparse("//" + h).hostname or h for h in first_party or ()}   # netlocs may carry a port
+        self.block_third_party = block_third_party
+        self.wait_until = wait_until
+        self.ready_selector = ready_selector
+        self.min_text = min_text
+        self.ready_timeout = ready_timeout
+        self.blocked = 0
+
+    def should_block(self, request):
+        if request.resource_type in self.block_types:
+            return True
+        host = urlparse(request.url).hostname or ""
+        if _host_matches(host, self.block_hosts):
+            return True
+        return self.block_third_party and bool(self.first_party) and not _host_matches(host, self.first_party)
+
+    # sync API
+    def _handle(self, route):
+        if self.should_block(route.request):
+            self.blocked += 1
+            route.abort()
+        else:
+            route.continue_()
+
+    def install(self, target):
+        """Attach the blocking layer to a sync Page or BrowserContext."""
+        if self.block_types or self.block_hosts or self.block_third_party:
+            target.route("**/*", self._handle)
+
+    def goto(self, page, url, timeout=30000):
+        response = page.goto(url, wait_until=self.wait_until, timeout=timeout)
+        self.wait_ready(page)
+        return response
+
+    def wait_ready(self, page):
+        """Wait (best effort) for the ready selector or enough body text after navigation."""
+        try:
+            if self.ready_selector:
+                page.wait_for_selector(self.ready_selector, state="attached", timeout=self.ready_timeout)
+            elif self.min_text:
+                page.wait_for_function(READY_JS, arg=self.min_text, timeout=self.ready_timeout)
+        except Exception:
+            pass
+
+    # async API
+    async def _handle_async(self, route):
+        if self.should_block(route.request):
+            self.blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def install_async(self, target):
+        """Attach the blocking layer to an async Page or BrowserContext."""
+        if self.block_types or self.block_hosts or self.block_third_party:
+            await target.route("**/*", self._handle_async)
+
+    async def goto_async(self, page, url, timeout=30000):
+        response = await page.goto(url, wait_until=self.wait_until, timeout=timeout)
+        await self.wait_ready_async(page)
+        return response
+
+    async def wait_ready_async(self, page):
+        try:
+            if self.ready_selector:
+                await page.wait_for_selector(self.ready_selector, state="attached", timeout=self.ready_timeout)
+            elif self.min_text:
+                await page.wait_for_function(READY_JS, arg=self.min_text, timeout=self.ready_timeout)
+        except Exception:
+            pass
+
+
+# Old behaviour: load everything and wait for the network to go quiet
+FULL_LOAD = LoadPolicy(block_types=(), block_hosts=(), wait_until="networkidle", min_text=0)
@@ -0,0 +1,134 @@
+# page_records.py
+# Compact crawl results: numeric fields in growable NumPy columns instead of one
+# dict per page, and page text zlib-compressed in an append-only blob file that
+# the table references by (offset, length).
+import os, tempfile, threading, zlib
+import numpy as np
+
+NO_STATUS = -1   # status column value for "no HTTP response"
+COLUMNS = {
+    "status": np.int16,
+    "tokens": np.int32,
+    "noise_ratio": np.float64,   # NaN when there is no text
+    "elapsed": np.float64,       # NaN when not measured
+    "bytes": np.int64,
+    "text_offset": np.int64,     # -1 when the text was not stored
+    "text_length": np.int32,
+}
+STAGE_PREFIX = "stage:"   # per-page stage timing columns (seconds, NaN when the stage did not run)
+
+
+class TextStore:
+    """Append-only file of zlib-compressed texts. `put` returns (offset, length)
+    for `get`; without a path the blobs go to an anonymous temporary file."""
+
+    def __init__(self, path=None, level=6):
+        self.path, self.level = path, level
+        self._f = open(path, "w+b") if path else tempfile.TemporaryFile()
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def put(self, text):
+        blob = zlib.compress(text.encode("utf-8"), self.level)
+        with self._lock:
+            offset = self.size
+            self.size += len(blob)
+        os.pwrite(self._f.fileno(), blob, offset)
+        return offset, len(blob)
+
+    def get(self, offset, length):
+        return zlib.decompress(os.pread(self._f.fileno(), length, offset)).decode("utf-8")
+
+    def close(self):
+        self._f.close()
+
+
+class PageTable:
+    """Crawl records stored column-wise.
+
+    `append(record, text)` takes the usual record dict (url, status, tokens,
+    noise_ratio, elapsed, bytes, ...) and keeps only its numbers in the
+    columns, its URL in a list, and any other field (error, rendered, ...) in
+    a sparse per-row dict; with a `text_store` the page text is spilled to it.
+    `stages` ({stage: seconds}, see instrumentation.Recorder.take_page) become
+    float columns, one per stage name seen. Iterating yields the record dicts
+    again, built on demand.
+    """
+
+    def __init__(self, text_store=None, capacity=1024):
+        self.text_store = text_store
+        self.n = 0
+        self.cols = {name: np.empty(capacity, dtype) for name, dtype in COLUMNS.items()}
+        self.urls = []
+        self.extra = {}   # row -> {field: value}
+
+    @classmethod
+    def from_records(cls, records):
+        table = cls(capacity=max(len(records), 1))
+        for r in records:
+            table.append(r)
+        return table
+
+    def __len__(self):
+        return self.n
+
+    def column(self, name):
+        return self.cols[name][:self.n]
+
+    def append(self, record, text=None, stages=None):
+        i = self.n
+        if i == len(self.cols["status"]):
+            self.cols = {name: np.resize(col, max(2 * len(col), 16)) for name, col in self.cols.items()}
+        status, noise, elapsed = record.get("status"), record.get("noise_ratio"), record.get("elapsed")
+        offset, length = self.text_store.put(text) if text is not None and self.text_store is not None else (-1, 0)
+        row = (NO_STATUS if status is None else status, record.get("tokens", 0), np.nan if noise is None else noise,
+               np.nan if elapsed is None else elapsed, record.get("bytes", 0), offset, length)
+        for name, value in zip(COLUMNS, row):
+            self.cols[name][i] = value
+        for name, col in self.cols.items():
+            if name.startswith(STAGE_PREFIX):
+                col[i] = np.nan
+        for stage, seconds in (stages or {}).items():
+            name = STAGE_PREFIX + stage
+            if name not in self.cols:
+                self.cols[name] = np.full(len(self.cols["status"]), np.nan)
+            self.cols[name][i] = seconds
+        self.urls.append(record["url"])
+        extra = {k: v for k, v in record.items() if k != "url" and k not in COLUMNS}
+        if extra:
+            self.extra[i] = extra
+        self.n += 1
+        return i
+
+    def reorder(self, order):
+        """Permute the rows in place, e.g. into discovery order."""
+        order = np.asarray(order, dtype=np.int64)
+        self.cols = {name: self.column(name)[order] for name in self.cols}
+        self.urls = [self.urls[j] for j in order]
+        where = {int(j): i for i, j in enumerate(order)}
+        self.extra = {where[j]: extra for j, extra in self.extra.items()}
+
+    def record(self, i):
+        status, noise, elapsed = int(self.cols["status"][i]), self.cols["noise_ratio"][i], self.cols["elapsed"][i]
+        r = {"url": self.urls[i], "status": None if status == NO_STATUS else status,
+             "tokens": int(self.cols["tokens"][i]), "noise_ratio": None if np.isnan(noise) else round(float(noise), 3)}
+        r.update(self.extra.get(i, {}))
+        r.update(elapsed=None if np.isnan(elapsed) else round(float(elapsed), 4), bytes=int(self.cols["bytes"][i]))
+        return r
+
+    def stages(self, i):
+        """{stage: seconds} timed for row i."""
+        return {name[len(STAGE_PREFIX):]: round(float(col[i]), 6) for name, col in self.cols.items()
+                if name.startswith(STAGE_PREFIX) and not np.isnan(col[i])}
+
+    def __iter__(self):
+        return (self.record(i) for i in range(self.n))
+
+    def text_ref(self, i):
+        """(offset, length) of row i's text in the text store, or None."""
+        offset = int(self.cols["text_offset"][i])
+        return (offset, int(self.cols["text_length"][i])) if offset >= 0 else None
+
+    def text(self, i):
+        ref = self.text_ref(i)
+        return self.text_store.get(*ref) if ref else None
@@ -1,75 +1,92 @@
 # pipeline_a_bs4.py
-import time, json, re, math
-from urllib.parse import urljoin, urlparse
-import requests
-from bs4 import BeautifulSoup
+import argparse, asyncio
+from html_extract import BACKENDS
+from frontier import load_url_list
+from http_cache import HttpCache
+from fixture_server import remap_url, remap_hosts
+from instrumentation import Recorder
+from page_records import TextStore
+import crawler_core
+from crawler_core import CrawlEngine, RequestsFetcher, AiohttpFetcher, PlaywrightFetcher, HtmlExtractor, InnerTextExtractor
 
 START_URLS = [
     "https://www.jio.com/business/",            # FAQs live here (server-rendered)
     # Add any deep links found under jio.com/business
 ]
 ALLOWED_HOSTS = {"www.jio.com", "jio.com"}
+START_URLS = [remap_url(u) for u in START_URLS]
+ALLOWED_HOSTS = remap_hosts(ALLOWED_HOSTS)
 
 HEADERS = {"User-Agent": "research-bot/1.0 (+contact: you@example.com)"}
 TIMEOUT = 20
 
-def is_allowed(url):
-    host = urlparse(url).netloc.lower()
-    return host in ALLOWED_HOSTS
+def make_engine(fetcher, max_pages=200, bloom_capacity=None, parser=None, follow=True, concurrency=1,
+                render_empty=False, text_store=None, recorder=None):
+    """CrawlEngine over ALLOWED_HOSTS with html_extract parsing off the event loop.
+    With `render_empty`, pages with no text are rendered again in headless Chromium;
+    with a page_records.TextStore, the extracted text is kept in it."""
+    render = (PlaywrightFetcher(workers=2), InnerTextExtractor()) if render_empty else None
+    return CrawlEngine(fetcher, HtmlExtractor(parser), ALLOWED_HOSTS, max_pages, follow=follow,
+                       concurrency=concurrency, bloom_capacity=bloom_capacity, render=render, text_store=text_store,
+                       recorder=recorder)
 
-def extract_main_text(html):
-    soup = BeautifulSoup(html, "html.parser")
-    # remove script/style/nav/footer
-    for tag in soup(["script","style","noscript","svg"]):
-        tag.decompose()
-    text = soup.get_text("\n", strip=True)
-    return text
+def crawl(urls, max_pages=200, bloom_capacity=None, parser=None, cache=None, follow=True, render_empty=False,
+          text_store=None, recorder=None, rate=None):
+    """One page at a time over requests, at most `rate` requests/sec per host (None: no cap).
+    Stages: wait (rate limiter), ttfb (incl. DNS/connect), download, extract, enqueue."""
+    fetcher = RequestsFetcher(HEADERS, TIMEOUT, cache, rate)
+    return make_engine(fetcher, max_pages, bloom_capacity, parser, follow, 1, render_empty, text_store,
+                       recorder).crawl(urls)
 
-def tokenize(s):  # simple token approximation (~word count)
-    return len(re.findall(r"\w+", s))
+async def crawl_async(urls, max_pages=200, concurrency=16, per_host=4, rate=None, bloom_capacity=None, parser=None, cache=None,
+                      follow=True, render_empty=False, text_store=None, recorder=None):
+    """Concurrent variant of `crawl`: same records, fetched over one keep-alive pool.
 
-def crawl(urls, max_pages=200):
-    seen, results = set(), []
-    q = list(urls)
-    t0 = time.time()
-    while q and len(results) < max_pages:
-        url = q.pop(0)
-        if url in seen or not is_allowed(url): continue
-        seen.add(url)
-        try:
-            r = requests.get(url, headers=HEADERS, timeout=TIMEOUT)
-            ok = (r.status_code == 200 and "text/html" in r.headers.get("Content-Type",""))
-            if not ok:
-                results.append({"url": url, "status": r.status_code, "error": "non-html", "tokens": 0, "noise_ratio": None})
-                continue
-            raw = r.text
-            clean = extract_main_text(raw)
-            tokens = tokenize(clean)
-            noise_ratio = (len(raw) - len(clean)) / max(len(raw),1)
-            results.append({"url": url, "status": 200, "tokens": tokens, "noise_ratio": round(noise_ratio,3)})
+    `concurrency` bounds in-flight requests overall, `per_host` bounds them per
+    host, and `rate` is the per-host token-bucket refill (requests/sec), off by
+    default as in `crawl`; the per-host cap keeps the load on each site polite.
+    With an http_cache.HttpCache, requests are conditional and 304s are served from it.
+    Stages: wait (rate limiter), dns, connect, ttfb, download, extract, enqueue.
+    """
+    fetcher = AiohttpFetcher(HEADERS, TIMEOUT, cache, concurrency, per_host, rate)
+    engine = make_engine(fetcher, max_pages, bloom_capacity, parser, follow, concurrency, render_empty, text_store,
+                         recorder)
+    return await engine.run(urls)
 
-            # enqueue links
-            soup = BeautifulSoup(raw, "html.parser")
-            for a in soup.find_all("a", href=True):
-                nxt = urljoin(url, a["href"])
-                if is_allowed(nxt):
-                    q.append(nxt.split("#")[0])
-        except Exception as e:
-            results.append({"url": url, "status": None, "error": str(e), "tokens": 0, "noise_ratio": None})
-    t1 = time.time()
-    return results, (t1 - t0)
+def build_report(results, elapsed, recorder=None):
+    return crawler_core.build_report("requests+bs4", results, elapsed, recorder)
 
 if __name__ == "__main__":
-    results, elapsed = crawl(START_URLS)
-    pages_ok = [r for r in results if r.get("status")==200 and r.get("tokens",0)>0]
-    throughput = len(results) / max(elapsed,1e-6)
-    report = {
-        "pipeline": "requests+bs4",
-        "pages_total": len(results),
-        "pages_ok": len(pages_ok),
-        "tokens_total": sum(r["tokens"] for r in pages_ok),
-        "avg_noise_ratio": round(sum(r["noise_ratio"] for r in pages_ok)/max(len(pages_ok),1),3),
-        "throughput_pages_per_sec": round(throughput,2),
-        "failures": [r for r in results if r.get("status")!=200 or r.get("tokens",0)==0]
-    }
-    print(json.dumps(report, indent=2))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--async", dest="use_async", action="store_true", help="concurrent aiohttp crawl")
+    ap.add_argument("--max-pages", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--per-host", type=int, default=4, help="concurrent requests per host (--async)")
+    ap.add_argument("--rate", type=float, default=None, help="per-host requests/sec cap, in both modes (default: none)")
+    ap.add_argument("--parser", choices=BACKENDS, default=None, help="HTML backend (default: fastest installed)")
+    ap.add_argument("--http-cache", default=None, help="conditional-request cache file (sqlite) for incremental recrawls")
+    ap.add_argument("--urls", default=None, help="fetch exactly the URLs in this file (one per line) without following links")
+    ap.add_argument("--metrics-file", default=None, help="also write stage histograms in Prometheus text format")
+    ap.add_argument("--text-store", default=None, help="keep extracted page text, zlib-compressed, in this blob file")
+    ap.add_argument("--render-empty", action="store_true", help="render pages that yield no text with headless Chromium")
+    args = ap.parse_args()
+    recorder = Recorder()
+    cache = HttpCache(args.http_cache) if args.http_cache else None
+    text_store = TextStore(args.text_store) if args.text_store else None
+    urls, max_pages, follow = START_URLS, args.max_pages, True
+    if args.urls:
+        urls = load_url_list(args.urls)
+        max_pages, follow = len(urls), False
+    if args.use_async:
+        results, elapsed = asyncio.run(crawl_async(urls, max_pages, args.concurrency, args.per_host, args.rate,
+                                                   parser=args.parser, cache=cache, follow=follow, render_empty=args.render_empty,
+                                                   text_store=text_store, recorder=recorder))
+    else:
+        results, elapsed = crawl(urls, max_pages, parser=args.parser, cache=cache, follow=follow,
+                                 render_empty=args.render_empty, text_store=text_store, recorder=recorder, rate=args.rate)
+    report = build_report(results, elapsed, recorder)
+    if args.metrics_file:
+        recorder.write_prometheus(args.metrics_file, report["pipeline"])
+    if cache is not None:
+        report["http_cache"] = cache.stats
+    crawler_core.dump_report(report)
@@ -1,51 +1,86 @@
 # pipeline_b_trafilatura.py (fixed)
-import time, json, re
-import trafilatura
-from trafilatura import sitemaps
+import time, argparse
+from frontier import SeenSet, load_url_list
+from sitemap_cache import SitemapCache, expand, USER_AGENT
+from http_cache import HttpCache
+from fixture_server import remap_url
+from instrumentation import Recorder
+from page_records import TextStore
+import crawler_core
+from crawler_core import CrawlEngine, TrafilaturaFetcher, TrafilaturaExtractor
 
 SEEDS = ["https://www.jio.com/business/"]
+SEEDS = [remap_url(u) for u in SEEDS]
 
-def tokenize(s):
-    return len(re.findall(r"\w+", s))
+def discover(urls, max_pages=200, cache=None, changed_only=False, workers=8):
+    """Unique (url, lastmod) pairs from the seeds' sitemaps, in sitemap order, capped at max_pages.
 
-def crawl(urls, max_pages=200):
-    seen, results = set(), []
-    t0 = time.time()
-    for url in urls:
-        # discover sitemap URLs
-        sitemap_list = sitemaps.sitemap_search(url) or []
-        for sm_url in sitemap_list:
-            # extract page URLs from sitemap
-            page_urls = sitemaps.sitemap_urls(sm_url) or []
-            for u in page_urls:
-                if len(results) >= max_pages: break
-                if u in seen: continue
-                seen.add(u)
-                downloaded = trafilatura.fetch_url(u)
-                if not downloaded:
-                    results.append({"url": u, "status": None, "error": "fetch_failed", "tokens": 0, "noise_ratio": None})
-                    continue
-                extracted = trafilatura.extract(downloaded, include_tables=False, include_links=False)
-                if not extracted:
-                    results.append({"url": u, "status": 200, "error": "no_main_content", "tokens": 0, "noise_ratio": None})
-                    continue
-                tokens = tokenize(extracted)
-                # Fake noise metric: 1 - (extracted/raw) ratio
-                noise_ratio = 1 - (len(extracted)/len(downloaded))
-                results.append({"url": u, "status": 200, "tokens": tokens, "noise_ratio": round(noise_ratio,3)})
-    elapsed = time.time() - t0
+    Sitemap indexes are expanded concurrently and revalidated against `cache`;
+    with `changed_only`, pages whose <lastmod> matches the last crawl are skipped.
+    """
+    cache = cache or SitemapCache(path=None)
+    seen, page_list = SeenSet(), []
+    for u, lastmod in expand(urls, cache, workers):
+        if len(page_list) >= max_pages: break
+        if not seen.add(u): continue
+        if changed_only and not cache.is_changed(u, lastmod): continue
+        page_list.append((u, lastmod))
+    return page_list
+
+def crawl(urls, max_pages=200, fetchers=8, extractors=None, cache=None, changed_only=False, http_cache=None,
+          url_list=None, text_store=None, recorder=None):
+    """Sitemap-driven crawl on the shared CrawlEngine: `fetchers` concurrent
+    downloads feed a process pool of `extractors`. Results keep sitemap order.
+    With `http_cache` (http_cache.HttpCache), pages are fetched conditionally.
+    `url_list` replaces sitemap discovery with a fixed set of pages; with a
+    page_records.TextStore the extracted text is kept in it.
+    Stages: discover (per run), download, extract (incl. waiting for an extractor process)."""
+    recorder = recorder or Recorder()
+    t0 = time.perf_counter()
+    if url_list is not None:
+        discovered = [(u, None) for u in url_list[:max_pages]]
+    else:
+        with recorder.span("discover"):
+            discovered = discover(urls, max_pages, cache, changed_only, fetchers)
+    engine = CrawlEngine(TrafilaturaFetcher(http_cache, USER_AGENT), TrafilaturaExtractor(), max_pages=len(discovered),
+                         follow=False, concurrency=fetchers, extract_in="process", extract_workers=extractors,
+                         text_store=text_store, recorder=recorder)
+    results, _ = engine.crawl([u for u, _ in discovered])
+    if cache is not None:
+        lastmods = dict(discovered)
+        for r in results:
+            if r.get("status") == 200:
+                cache.mark_crawled(r["url"], lastmods[r["url"]])
+        cache.save()
+    elapsed = time.perf_counter() - t0
     return results, elapsed
 
+def build_report(results, elapsed, recorder=None):
+    return crawler_core.build_report("trafilatura", results, elapsed, recorder)
+
 if __name__ == "__main__":
-    results, elapsed = crawl(SEEDS)
-    ok = [r for r in results if r.get("status")==200 and r.get("tokens",0)>0]
-    report = {
-        "pipeline": "trafilatura",
-        "pages_total": len(results),
-        "pages_ok": len(ok),
-        "tokens_total": sum(r["tokens"] for r in ok),
-        "avg_noise_ratio": round(sum(r["noise_ratio"] for r in ok)/max(len(ok),1),3),
-        "throughput_pages_per_sec": round(len(results)/max(elapsed,1e-6),2),
-        "failures": [r for r in results if r.get("status")!=200 or r.get("tokens",0)==0]
-    }
-    print(json.dumps(report, indent=2))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-pages", type=int, default=200)
+    ap.add_argument("--fetchers", type=int, default=8, help="concurrent download threads")
+    ap.add_argument("--extractors", type=int, default=None, help="extraction processes (default: CPU count)")
+    ap.add_argument("--sitemap-cache", default="sitemap_cache.json", help="sitemap cache file ('' to disable)")
+    ap.add_argument("--changed-only", action="store_true", help="only crawl pages whose <lastmod> changed since the last run")
+    ap.add_argument("--http-cache", default=None, help="conditional-request cache file (sqlite) for incremental recrawls")
+    ap.add_argument("--urls", default=None, help="fetch exactly the URLs in this file (one per line) instead of the sitemaps")
+    ap.add_argument("--text-store", default=None, help="keep extracted page text, zlib-compressed, in this blob file")
+    ap.add_argument("--metrics-file", default=None, help="also write stage histograms in Prometheus text format")
+    args = ap.parse_args()
+    recorder = Recorder()
+    url_list = load_url_list(args.urls) if args.urls else None
+    cache = SitemapCache(args.sitemap_cache) if args.sitemap_cache and url_list is None else None
+    http_cache = HttpCache(args.http_cache) if args.http_cache else None
+    text_store = TextStore(args.text_store) if args.text_store else None
+    results, elapsed = crawl(SEEDS, len(url_list) if url_list else args.max_pages, args.fetchers, args.extractors,
+                             cache=cache, changed_only=args.changed_only, http_cache=http_cache, url_list=url_list,
+                             text_store=text_store, recorder=recorder)
+    report = build_report(results, elapsed, recorder)
+    if args.metrics_file:
+        recorder.write_prometheus(args.metrics_file, report["pipeline"])
+    if http_cache is not None:
+        report["http_cache"] = http_cache.stats
+    crawler_core.dump_report(report)
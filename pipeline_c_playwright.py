@@ -1,8 +1,13 @@
 # pipeline_c_playwright.py
 # pip install playwright && playwright install
-import asyncio, json, re, time
-from urllib.parse import urljoin, urlparse
-from playwright.async_api import async_playwright
+import asyncio, argparse
+from frontier import load_url_list
+from page_loading import LoadPolicy, FULL_LOAD
+from fixture_server import remap_url, remap_hosts
+from instrumentation import Recorder
+from page_records import TextStore
+import crawler_core
+from crawler_core import CrawlEngine, PlaywrightFetcher, InnerTextExtractor
 
 START_URLS = [
     "https://jiopay.com/business/",
@@ -12,57 +17,48 @@ START_URLS = [
     "https://www.jiopay.com/business/paymentgateway",
 ]
 ALLOWED_HOSTS = {"jiopay.com","www.jiopay.com"}
+START_URLS = [remap_url(u) for u in START_URLS]
+ALLOWED_HOSTS = remap_hosts(ALLOWED_HOSTS)
 
-def tokenize(s):
-    return len(re.findall(r"\w+", s))
+async def crawl(max_pages=150, max_depth=2, workers=4, page_budget=60, policy=None, start_urls=None, text_store=None,
+                recorder=None):
+    """Render with `workers` pages, each in its own context, pulling from the CrawlEngine's queue.
 
-async def crawl(max_pages=150, max_depth=2):
-    seen, results, queue = set(), [], [(u,0) for u in START_URLS]
-    t0 = time.time()
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(java_script_enabled=True)
-        page = await context.new_page()
-        while queue and len(results) < max_pages:
-            url, depth = queue.pop(0)
-            if url in seen: continue
-            seen.add(url)
-            host = urlparse(url).netloc.lower()
-            if host not in ALLOWED_HOSTS: continue
-            try:
-                response = await page.goto(url, wait_until="networkidle", timeout=45000)
-                status = response.status if response else None
-                html = await page.content()
-                txt = await page.evaluate("""() => {
-                    const kill = s => s && s.remove();
-                    document.querySelectorAll('script,style,noscript,svg').forEach(kill);
-                    return document.body ? document.body.innerText : '';
-                }""")
-                tokens = tokenize(txt)
-                noise_ratio = (len(html)-len(txt))/max(len(html),1)
-                results.append({"url": url, "status": status, "tokens": tokens, "noise_ratio": round(noise_ratio,3)})
-                if depth < max_depth:
-                    links = await page.eval_on_selector_all("a[href]", "els => els.map(e => e.getAttribute('href'))")
-                    for href in links:
-                        if not href: continue
-                        nxt = urljoin(url, href.split("#")[0])
-                        if urlparse(nxt).netloc.lower() in ALLOWED_HOSTS and nxt not in seen:
-                            queue.append((nxt, depth+1))
-            except Exception as e:
-                results.append({"url": url, "status": None, "error": str(e), "tokens": 0, "noise_ratio": None})
-        await browser.close()
-    elapsed = time.time() - t0
-    ok = [r for r in results if r.get("status") and r.get("tokens",0)>0]
-    report = {
-        "pipeline": "playwright-headless",
-        "pages_total": len(results),
-        "pages_ok": len(ok),
-        "tokens_total": sum(r["tokens"] for r in ok),
-        "avg_noise_ratio": round(sum(r["noise_ratio"] for r in ok)/max(len(ok),1),3) if ok else None,
-        "throughput_pages_per_sec": round(len(results)/max(elapsed,1e-6),2),
-        "failures": [r for r in results if r.get("status") is None or r.get("tokens",0)==0]
-    }
-    print(json.dumps(report, indent=2))
+    Every visit gets `page_budget` seconds end to end; a page that crashes or
+    blows its budget is closed and replaced before the worker continues.
+    `policy` (page_loading.LoadPolicy) decides what to block and when a page is ready;
+    by default everything outside ALLOWED_HOSTS is blocked as well.
+    Stages: navigate, render_wait, dom, links, extract, enqueue.
+    """
+    fetcher = PlaywrightFetcher(workers, policy or LoadPolicy(first_party=ALLOWED_HOSTS, block_third_party=True), page_budget)
+    engine = CrawlEngine(fetcher, InnerTextExtractor(), ALLOWED_HOSTS, max_pages, max_depth, concurrency=workers,
+                         extract_in="inline", text_store=text_store, recorder=recorder)
+    results, elapsed = await engine.run(START_URLS if start_urls is None else start_urls)
+    report = build_report(results, elapsed, engine.recorder)
+    crawler_core.dump_report(report)
+    return report
+
+def build_report(results, elapsed, recorder=None):
+    return crawler_core.build_report("playwright-headless", results, elapsed, recorder, any_status=True)
 
 if __name__ == "__main__":
-    asyncio.run(crawl())
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-pages", type=int, default=150)
+    ap.add_argument("--max-depth", type=int, default=2)
+    ap.add_argument("--workers", type=int, default=4, help="concurrent pages")
+    ap.add_argument("--page-budget", type=float, default=60, help="seconds allowed per page")
+    ap.add_argument("--full-load", action="store_true", help="load every resource and wait for networkidle")
+    ap.add_argument("--urls", default=None, help="render exactly the URLs in this file (one per line) without following links")
+    ap.add_argument("--text-store", default=None, help="keep extracted page text, zlib-compressed, in this blob file")
+    ap.add_argument("--metrics-file", default=None, help="also write stage histograms in Prometheus text format")
+    args = ap.parse_args()
+    recorder = Recorder()
+    start_urls, max_pages, max_depth = None, args.max_pages, args.max_depth
+    if args.urls:
+        start_urls = load_url_list(args.urls)
+        max_pages, max_depth = len(start_urls), 0
+    report = asyncio.run(crawl(max_pages, max_depth, args.workers, args.page_budget,
+                               FULL_LOAD if args.full_load else None, start_urls,
+                               TextStore(args.text_store) if args.text_store else None, recorder))
+    if args.metrics_file:
+        recorder.write_prometheus(args.metrics_file, report["pipeline"])
@@ -0,0 +1,264 @@
+# rag_index.py
+# Chunk the scraped knowledge base, embed the chunks and keep a persistent,
+# memory-mapped vector index (IVF) that rebuilds incrementally by content hash.
+import argparse, hashlib, json, os, re
+import numpy as np
+from jsonl_store import read_records
+from bm25_index import BM25Index, reciprocal_rank_fusion
+
+DEFAULT_INPUTS = ["jiopay_rag_knowledge_base_faq.jsonl", "jiopay_help_center.jsonl"]
+TOKEN = re.compile(r"\w+")
+
+
+def chunk_text(text, max_tokens=200, overlap=40):
+    """Split text into windows of at most `max_tokens` word tokens overlapping by `overlap`.
+
+    Windows are cut on token boundaries and keep the original text between them.
+    """
+    spans = [m.span() for m in TOKEN.finditer(text)]
+    if not spans:
+        return []
+    step = max(max_tokens - overlap, 1)
+    chunks = []
+    for start in range(0, len(spans), step):
+        window = spans[start:start + max_tokens]
+        chunks.append(text[window[0][0]:window[-1][1]])
+        if start + max_tokens >= len(spans):
+            break
+    return chunks
+
+
+def iter_chunks(records, max_tokens=200, overlap=40):
+    """Yield chunk dicts (id, text, kind and category/url/title/source metadata) for KB records."""
+    for rec in records:
+        if rec.get("duplicate_of"):
+            continue
+        meta = {k: rec.get(k) for k in ("category", "url", "title", "source")}
+        meta["category"] = meta["category"] or meta["source"]   # help-center records carry no category
+        pieces = [("content", t) for t in chunk_text(rec.get("content") or "", max_tokens, overlap)]
+        for faq in rec.get("faqs") or []:
+            qa = f"Q: {faq.get('question', '')}\nA: {faq.get('answer', '')}"
+            pieces += [("faq", t) for t in chunk_text(qa, max_tokens, overlap)] if len(TOKEN.findall(qa)) > max_tokens else [("faq", qa)]
+        for kind, text in pieces:
+            cid = hashlib.sha1(f"{meta['url']}\x00{kind}\x00{text}".encode("utf-8")).hexdigest()
+            yield dict(meta, id=cid, kind=kind, text=text)
+
+
+class HashingEmbedder:
+    """Stateless feature-hashing embedder (unigrams + bigrams, log TF, L2-normalized).
+
+    Needs no model download and gives identical vectors on every machine.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        words = TOKEN.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feat in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feat.encode("utf-8"), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        out = np.sign(out) * np.log1p(np.abs(out))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder:
+    """Local CPU sentence-transformers model (optional dependency)."""
+
+    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st:{model_name}"
+
+    def embed(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def make_embedder(spec):
+    """"hashing", "hashing:<dim>" or "st:<model name>"."""
+    if spec.startswith("st:"):
+        return SentenceTransformerEmbedder(spec[3:])
+    dim = int(spec.split(":", 1)[1]) if ":" in spec else 512
+    return HashingEmbedder(dim)
+
+
+def train_ivf(vectors, n_lists=None, iters=10, seed=0):
+    """Spherical k-means coarse quantizer; returns (centroids, order, offsets) where list
+    i holds rows order[offsets[i]:offsets[i+1]]."""
+    n = len(vectors)
+    n_lists = n_lists or max(1, int(np.sqrt(n)))
+    n_lists = min(n_lists, n)
+    rng = np.random.default_rng(seed)
+    centroids = np.array(vectors[rng.choice(n, n_lists, replace=False)], dtype=np.float32)
+    for _ in range(iters):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(n_lists):
+            members = vectors[assign == c]
+            if len(members):
+                v = members.sum(axis=0)
+                centroids[c] = v / max(np.linalg.norm(v), 1e-12)
+    assign = np.argmax(vectors @ centroids.T, axis=1)
+    order = np.argsort(assign, kind="stable").astype(np.int64)
+    offsets = np.searchsorted(assign[order], np.arange(n_lists + 1)).astype(np.int64)
+    return centroids, order, offsets
+
+
+class RagIndex:
+    """On-disk index directory:
+        manifest.json   embedder name/dim, chunk count
+        chunks.jsonl    chunk metadata + text, row-aligned with vectors
+        vectors.npy     float32 [n, dim], opened with mmap (no re-embedding at startup)
+        ivf.npz         centroids + inverted lists
+        bm25_*          keyword index over the same rows (see bm25_index.py)
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.manifest = None
+        self.chunks = []
+        self.vectors = None
+        self.centroids = self.order = self.offsets = None
+        self.bm25 = None
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    @classmethod
+    def load(cls, index_dir):
+        idx = cls(index_dir)
+        with open(idx._path("manifest.json"), encoding="utf-8") as f:
+            idx.manifest = json.load(f)
+        idx.chunks = list(read_records(idx._path("chunks.jsonl")))
+        idx.vectors = np.load(idx._path("vectors.npy"), mmap_mode="r")
+        if os.path.exists(idx._path("ivf.npz")):
+            ivf = np.load(idx._path("ivf.npz"))
+            idx.centroids, idx.order, idx.offsets = ivf["centroids"], ivf["order"], ivf["offsets"]
+        if BM25Index.exists(index_dir):
+            idx.bm25 = BM25Index.load(index_dir)
+        return idx
+
+    @classmethod
+    def build(cls, index_dir, records, embedder, max_tokens=200, overlap=40, batch_size=256, log=print):
+        """(Re)build the index from records, embedding only chunks whose hash is new."""
+        os.makedirs(index_dir, exist_ok=True)
+        old = None
+        if os.path.exists(os.path.join(index_dir, "manifest.json")):
+            old = cls.load(index_dir)
+            if old.manifest["embedder"] != embedder.name:
+                old = None   # different embedding space: nothing reusable
+        reuse = {c["id"]: i for i, c in enumerate(old.chunks)} if old else {}
+
+        chunks, seen = [], set()
+        for c in iter_chunks(records, max_tokens, overlap):
+            if c["id"] not in seen:
+                seen.add(c["id"])
+                chunks.append(c)
+        idx = cls(index_dir)
+        tmp = idx._path("vectors.tmp.npy")
+        vectors = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(len(chunks), embedder.dim))
+        todo = []
+        for row, c in enumerate(chunks):
+            if c["id"] in reuse:
+                vectors[row] = old.vectors[reuse[c["id"]]]
+            else:
+                todo.append(row)
+        for start in range(0, len(todo), batch_size):
+            rows = todo[start:start + batch_size]
+            vectors[rows] = embedder.embed([chunks[r]["text"] for r in rows])
+        vectors.flush()
+        del vectors
+        old = None   # release the old mmap before replacing the file
+        os.replace(tmp, idx._path("vectors.npy"))
+        with open(idx._path("chunks.jsonl"), "w", encoding="utf-8") as f:
+            for c in chunks:
+                f.write(json.dumps(c, ensure_ascii=False) + "\n")
+        idx.vectors = np.load(idx._path("vectors.npy"), mmap_mode="r")
+        if len(chunks):
+            idx.centroids, idx.order, idx.offsets = train_ivf(np.asarray(idx.vectors))
+            np.savez(idx._path("ivf.npz"), centroids=idx.centroids, order=idx.order, offsets=idx.offsets)
+        idx.bm25 = BM25Index.build(f"{c['title'] or ''}\n{c['text']}" for c in chunks)
+        idx.bm25.save(index_dir)
+        idx.manifest = {"embedder": embedder.name, "dim": embedder.dim, "chunks": len(chunks),
+                        "max_tokens": max_tokens, "overlap": overlap}
+        with open(idx._path("manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(idx.manifest, f, indent=2)
+        idx.chunks = chunks
+        log(f"Indexed {len(chunks)} chunks ({len(todo)} embedded, {len(chunks) - len(todo)} reused)")
+        return idx
+
+    def search_vector(self, qv, k=5, nprobe=8):
+        """Top-k (score, row) by cosine; probes the `nprobe` closest IVF lists (exact if no IVF)."""
+        if self.vectors is None or not len(self.vectors):
+            return []
+        if self.centroids is not None and nprobe < len(self.centroids):
+            lists = np.argsort(-(self.centroids @ qv))[:nprobe]
+            rows = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+        else:
+            rows = np.arange(len(self.vectors))
+        if not len(rows):
+            return []
+        rows = np.sort(rows)   # sequential reads from the memmap
+        scores = np.asarray(self.vectors[rows]) @ qv
+        top = np.argsort(-scores)[:k]
+        return [(float(scores[i]), int(rows[i])) for i in top]
+
+    def search(self, query, embedder, k=5, nprobe=8):
+        qv = embedder.embed([query])[0]
+        return [(score, self.chunks[row]) for score, row in self.search_vector(qv, k, nprobe)]
+
+    def hybrid_search(self, query, embedder, k=5, nprobe=8, depth=50, rrf_k=60):
+        """Dense and BM25 top-`depth` lists fused by reciprocal rank fusion."""
+        dense = [row for _, row in self.search_vector(embedder.embed([query])[0], depth, nprobe)]
+        if self.bm25 is None:
+            return [(1.0 / (rrf_k + r), self.chunks[row]) for r, row in enumerate(dense[:k], 1)]
+        keyword = [row for _, row in self.bm25.search(query, depth)]
+        return [(score, self.chunks[row]) for score, row in reciprocal_rank_fusion([dense, keyword], rrf_k)[:k]]
+
+
+def iter_records(paths):
+    """Stream records from every existing KB output (.jsonl parts or legacy .json)."""
+    for p in paths:
+        if p.endswith(".json") and not os.path.exists(p):
+            print(f"Skipping missing {p}")
+            continue
+        yield from read_records(p)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build or query the RAG chunk index")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("inputs", nargs="*", default=DEFAULT_INPUTS)
+    b.add_argument("--max-tokens", type=int, default=200)
+    b.add_argument("--overlap", type=int, default=40)
+    q = sub.add_parser("query")
+    q.add_argument("text")
+    q.add_argument("-k", type=int, default=5)
+    q.add_argument("--nprobe", type=int, default=8)
+    q.add_argument("--mode", choices=["hybrid", "dense", "bm25"], default="hybrid")
+    for p in (b, q):
+        p.add_argument("--index-dir", default="rag_index")
+        p.add_argument("--embedder", default="hashing", help='"hashing[:dim]" or "st:<model>"')
+    args = ap.parse_args()
+    embedder = make_embedder(args.embedder)
+    if args.cmd == "build":
+        RagIndex.build(args.index_dir, iter_records(args.inputs), embedder, args.max_tokens, args.overlap)
+    else:
+        idx = RagIndex.load(args.index_dir)
+        if args.mode == "hybrid":
+            hits = idx.hybrid_search(args.text, embedder, args.k, args.nprobe)
+        elif args.mode == "bm25":
+            hits = [(score, idx.chunks[row]) for score, row in idx.bm25.search(args.text, args.k)]
+        else:
+            hits = idx.search(args.text, embedder, args.k, args.nprobe)
+        for score, chunk in hits:
+            print(f"{score:.3f}  [{chunk['category']}] {chunk['title']}  {chunk['url']}")
+            print("      " + chunk["text"][:200].replace("\n", " "))
@@ -0,0 +1,160 @@
+# rate_limit.py
+# Per-host politeness primitives shared by the crawlers.
+import asyncio, time
+from collections import deque
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/sec, up to `burst` banked.
+
+    `reserve()` takes a token immediately (the balance may go negative) and
+    returns how long the caller must wait before using it, so concurrent callers
+    queue up fairly without holding a lock across the sleep.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class HostLimiter:
+    """Async per-host concurrency cap plus token-bucket rate limit (none if `rate` is None)."""
+
+    def __init__(self, per_host=4, rate=5.0, burst=None):
+        self.per_host = per_host
+        self.rate = rate
+        self.burst = burst
+        self._sems, self._buckets = {}, {}
+
+    def _for(self, host):
+        if host not in self._sems:
+            self._sems[host] = asyncio.Semaphore(self.per_host)
+            self._buckets[host] = TokenBucket(self.rate, self.burst) if self.rate else None
+        return self._sems[host], self._buckets[host]
+
+    @asynccontextmanager
+    async def slot(self, host):
+        sem, bucket = self._for(host)
+        async with sem:
+            wait = bucket.reserve() if bucket is not None else 0.0
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), else None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        from datetime import datetime, timezone
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except Exception:
+        return None
+
+
+def robots_crawl_delay(origin, user_agent="*", timeout=10):
+    """Crawl-delay (or 1/Request-rate) advertised by origin's robots.txt, if any."""
+    from urllib.robotparser import RobotFileParser
+    from urllib.request import Request, urlopen
+    try:
+        req = Request(origin.rstrip("/") + "/robots.txt", headers={"User-Agent": user_agent})
+        with urlopen(req, timeout=timeout) as r:
+            lines = r.read().decode("utf-8", "replace").splitlines()
+    except Exception:
+        return None
+    rp = RobotFileParser()
+    rp.parse(lines)
+    delay = rp.crawl_delay(user_agent)
+    if delay is None and rp.request_rate(user_agent):
+        rate = rp.request_rate(user_agent)
+        delay = rate.seconds / max(rate.requests, 1)
+    return float(delay) if delay is not None else None
+
+
+class HostScheduler:
+    """Synchronous per-host crawl scheduler.
+
+    Items are queued per host and `pop()` hands out the item whose host is ready
+    soonest, so a slow or throttled host never stalls the others. Each host's
+    delay starts at its robots.txt Crawl-delay (or `default_delay`), doubles on
+    429/5xx (respecting Retry-After) and decays back once responses recover.
+    """
+
+    def __init__(self, default_delay=1.0, max_delay=60.0, max_retries=2, user_agent="*", use_robots=True):
+        self.default_delay = default_delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.user_agent = user_agent
+        self.use_robots = use_robots
+        self.queues = {}     # host -> deque of (url, item)
+        self.next_at = {}    # host -> monotonic time of next allowed request
+        self.base = {}       # host -> politeness floor
+        self.delay = {}      # host -> current (possibly backed-off) delay
+        self.retries = {}    # url -> attempts so far
+
+    def _politeness(self, host, url):
+        # robots.txt is only consulted once a host is actually about to be fetched
+        if host not in self.base:
+            delay = None
+            if self.use_robots:
+                parts = urlparse(url)
+                delay = robots_crawl_delay(f"{parts.scheme}://{parts.netloc}", self.user_agent)
+            self.base[host] = delay if delay is not None else self.default_delay
+            self.delay[host] = self.base[host]
+        return self.delay[host]
+
+    def push(self, url, item=None):
+        host = urlparse(url).netloc.lower()
+        if host not in self.queues:
+            self.queues[host] = deque()
+            self.next_at[host] = 0.0
+        self.queues[host].append((url, item if item is not None else url))
+
+    def __len__(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def pop(self):
+        """Return the next (url, item), sleeping only if every pending host is cooling down."""
+        ready = [h for h, q in self.queues.items() if q]
+        if not ready:
+            raise IndexError("pop from empty scheduler")
+        host = min(ready, key=lambda h: self.next_at[h])
+        wait = self.next_at[host] - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        url, item = self.queues[host].popleft()
+        self.next_at[host] = time.monotonic() + self._politeness(host, url)
+        return url, item
+
+    def feedback(self, url, status=None, retry_after=None):
+        """Adapt the host's delay to a response; returns True if the URL should be retried."""
+        host = urlparse(url).netloc.lower()
+        self._politeness(host, url)
+        if status == 429 or (status is not None and status >= 500):
+            backoff = max(self.delay[host] * 2, self.base[host], 1.0)
+            if retry_after is not None:
+                backoff = max(backoff, retry_after)
+            self.delay[host] = min(self.max_delay, backoff)
+            self.next_at[host] = time.monotonic() + self.delay[host]
+            attempts = self.retries.get(url, 0) + 1
+            self.retries[url] = attempts
+            return attempts <= self.max_retries
+        self.delay[host] = max(self.base[host], self.delay[host] / 2)
+        return False
@@ -1,9 +1,15 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import json
-import time
-from playwright.sync_api import sync_playwright
+from urllib.parse import urlparse
+from browser_pool import BrowserPool
+from rate_limit import HostScheduler, parse_retry_after
+from frontier import SeenSet
+from html_extract import extract_page
+from page_loading import LoadPolicy
+from http_cache import HttpCache, cached_get
+from crawl_checkpoint import CrawlJournal
+from jsonl_store import JsonlWriter
+from dedupe import PageDeduper
+from fixture_server import remap_url, remap_hosts, unmap_url
+from fetch_tiers import TierPolicy, STATIC, RENDER
 
 # Seed URLs
 seed_urls = [
@@ -29,8 +35,16 @@ external_pages = [
      "source": "Regulatory and Compliance References"},
 ]
 
-visited = set()
-knowledge_base = []
+for page in seed_urls + external_pages:
+    page["url"] = remap_url(page["url"])
+INTERNAL_HOSTS = remap_hosts({"jiopay.com", "www.jiopay.com"})
+
+# Skip images/fonts/media/analytics and stop waiting once the DOM has text
+LOAD_POLICY = LoadPolicy()
+# Learned static-vs-render decisions (see fetch_tiers.py); main() loads the persisted ones
+TIERS = TierPolicy(path=None)
+
+visited = SeenSet()
 
 
 # Categorize pages
@@ -53,139 +67,216 @@ def categorize(url, source):
         return source
 
 
-# Extract text and title from HTML
-def extract_text_and_title(html, url):
-    soup = BeautifulSoup(html, "html.parser")
-    title_tag = soup.find("title")
-    title = title_tag.get_text(strip=True) if title_tag else url
-    for script in soup(["script", "style"]):
-        script.decompose()
-    text = soup.get_text(separator=" ", strip=True)
-    text = ' '.join(text.split())
-    return text, title
-
-
-# Extract FAQs if present
-def extract_faqs(soup):
-    faqs = []
-    # Adjust selectors based on actual FAQ HTML structure
-    for item in soup.select("div.faq-item, div[data-faq]"):
-        question = item.select_one("h3, .faq-question")
-        answer = item.select_one("p, .faq-answer")
-        if question and answer:
-            faqs.append({
-                "question": question.get_text(strip=True),
-                "answer": answer.get_text(strip=True)
-            })
-    return faqs if faqs else None
-
-
-# Scrape page with Playwright fallback
-def scrape_page(url):
-    if url.startswith("mailto:") or url.endswith((".pdf", ".apk", ".doc",
-                                                  ".docx")) or "scribd.com" in url or "play.google.com" in url or "apps.apple.com" in url:
-        return f"Reference link: {url}", url, None
+# Extract text (one line per text block), title, FAQs and internal links from a single parse of the HTML
+def parse_page(html, url, base_url):
+    page = extract_page(html, base_url)
+    text = page.text
+    title = page.title if page.title is not None else unmap_url(url)
+    return text, title, page.faqs or None, extract_internal_links(page.links)
+
+
+def reference(url, fetch=None):
+    url = unmap_url(url)   # the record shows the real site, not a fixture port
+    return f"Reference link: {url}", url, None, set(), fetch or {"status": None, "retry_after": None}
+
+
+def fetch_static(url, cache=None):
+    response = cached_get(url, cache, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+    fetch = {"status": response.status_code, "retry_after": parse_retry_after(response.headers.get("Retry-After"))}
+    return response, fetch
+
+
+def fetch_rendered(url, pool):
+    with pool.page() as page:
+        response = LOAD_POLICY.goto(page, url, timeout=30000)
+        html = page.content()
+        base_url = page.url or url
+    fetch = {"status": response.status if response else None,
+             "retry_after": parse_retry_after(response.headers.get("retry-after")) if response else None}
+    return html, base_url, fetch
+
+
+# Used when the browser fails on a page that was sent straight to it; the outcome
+# says nothing about which tier the page needs, so nothing is learned from it.
+def static_fallback(url, cache=None):
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            page.goto(url, timeout=30000)
-            page.wait_for_load_state("networkidle")
-            html = page.content()
-            browser.close()
-            soup = BeautifulSoup(html, "html.parser")
-            text, title = extract_text_and_title(html, url)
-            faqs = extract_faqs(soup)
-            return text, title, faqs
+        response, fetch = fetch_static(url, cache)
+        if fetch["status"] == 200 and "html" in response.headers.get("Content-Type", "text/html"):
+            return parse_page(response.text, url, response.url or url) + (fetch,)
     except Exception as e:
-        print(f"Playwright failed for {url}, falling back to Requests+BeautifulSoup: {e}")
+        print(f"Static fallback failed for {url}: {e}")
+    return None
+
+
+# Static-first: a plain HTTP fetch + parse, escalating to the (lazily started) browser
+# only when the page looks client-rendered or the host/path is known to need it.
+# The last element reports the HTTP status/Retry-After so the scheduler can back off.
+def scrape_page(url, pool, cache=None, tiers=None):
+    if url.startswith("mailto:") or url.endswith((".pdf", ".apk", ".doc",
+                                                  ".docx")) or "scribd.com" in url or "play.google.com" in url or "apps.apple.com" in url:
+        return reference(url)
+    tiers = tiers or TIERS
+    key = unmap_url(url)   # decisions are stored against the real site, not a fixture port
+    static = None
+    if tiers.tier(key) == STATIC:
         try:
-            headers = {"User-Agent": "Mozilla/5.0"}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            text, title = extract_text_and_title(response.text, url)
-            soup = BeautifulSoup(response.text, "html.parser")
-            faqs = extract_faqs(soup)
-            return text, title, faqs
-        except Exception as e2:
-            print(f"Requests failed for {url}: {e2}")
-            return f"Reference link: {url}", url, None
-
-
-# Extract internal links
-def extract_internal_links(html, base_url):
-    soup = BeautifulSoup(html, "html.parser")
-    links = set()
-    for a in soup.find_all("a", href=True):
-        href = a['href']
-        full_url = urljoin(base_url, href).split('#')[0]
-        if urlparse(full_url).netloc.endswith("jiopay.com"):
-            links.add(full_url)
-    return links
-
-
-# Crawl internal pages
-queue = seed_urls.copy()
-while queue:
-    page_info = queue.pop(0)
-    url = page_info['url']
-    source = page_info['source']
-    if url in visited:
-        continue
-    visited.add(url)
-
-    print(f"Scraping internal: {url}")
-    content, title, faqs = scrape_page(url)
-    category = categorize(url, source)
-
-    knowledge_base.append({
-        "source": source,
-        "category": category,
-        "title": title,
-        "url": url,
-        "content": content,
-        "faqs": faqs
-    })
-
-    # Extract internal links
+            response, fetch = fetch_static(url, cache)
+        except Exception as e:
+            print(f"Static fetch failed for {url}: {e}")
+            response, fetch = None, {"status": None, "retry_after": None}
+        status = fetch["status"]
+        if status == 429 or (status is not None and status >= 500):
+            return reference(url, fetch)   # throttled: let the scheduler back off instead of rendering
+        if response is not None and status == 200:
+            if "html" not in response.headers.get("Content-Type", "text/html"):
+                return reference(url, fetch)
+            try:
+                static = parse_page(response.text, url, response.url or url) + (fetch,)
+                reason = tiers.needs_render(response.text, static[0])
+            except Exception as e:
+                print(f"Parsing failed for {url}: {e}")
+                reason = "parse_error"
+            if reason is None:
+                tiers.stats["static"] += 1
+                tiers.learn(key, STATIC)
+                return static
+        else:
+            reason = f"status_{status}"
+        print(f"Rendering {url} ({reason})")
+        tiers.stats["escalated"] += 1
+    else:
+        tiers.stats["rendered_direct"] += 1
     try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        links = extract_internal_links(response.text, url)
-        for link in links:
-            if link not in visited:
-                queue.append({"url": link, "source": source})
+        html, base_url, fetch = fetch_rendered(url, pool)
+        rendered = parse_page(html, url, base_url) + (fetch,)
     except Exception as e:
-        print(f"Failed to extract links from {url}: {e}")
-
-    time.sleep(1)
-
-# Crawl external pages
-for page in external_pages:
-    url = page['url']
-    source = page['source']
-    if url in visited:
-        continue
-    visited.add(url)
-
-    print(f"Scraping external: {url}")
-    content, title, faqs = scrape_page(url)
-    category = categorize(url, source)
-
-    knowledge_base.append({
-        "source": source,
-        "category": category,
-        "title": title,
-        "url": url,
-        "content": content,
-        "faqs": faqs
-    })
-
-    time.sleep(1)
-
-# Save JSON
-with open("jiopay_rag_knowledge_base_faq.json", "w", encoding="utf-8") as f:
-    json.dump(knowledge_base, f, ensure_ascii=False, indent=2)
-
-print(f"Scraping completed. Total pages collected: {len(knowledge_base)}")
+        print(f"Playwright failed for {url}: {e}")
+        if static is None and tiers.tier(key) == RENDER:
+            static = static_fallback(url, cache)   # rendered directly: the plain fetch was never tried
+        return static or reference(url)
+    if static is not None and len(rendered[0].split()) <= len(static[0].split()):
+        tiers.stats["render_unhelpful"] += 1
+        tiers.learn(key, STATIC)
+        return static
+    tiers.learn(key, RENDER)
+    return rendered
+
+
+# Keep only internal links
+def extract_internal_links(links):
+    return {link for link in links
+            if urlparse(link).netloc.endswith("jiopay.com") or urlparse(link).netloc in INTERNAL_HOSTS}
+
+
+def initial_items():
+    return ([dict(p, follow=True) for p in seed_urls] +
+            [dict(p, follow=False) for p in external_pages])
+
+
+def crawl(pool, scheduler, writer, cache=None, journal=None, pending=None, deduper=None, dedupe_mode="drop", tiers=None):
+    # Internal and external pages share one per-host schedule, so a slow or
+    # throttled host only delays its own URLs. Records are streamed to `writer`
+    # as pages complete rather than held in memory. With a `deduper`, site-wide
+    # boilerplate lines are stripped and duplicate pages are dropped ("drop") or
+    # kept with a `duplicate_of` pointer ("cluster").
+    pending = initial_items() if pending is None else pending
+    for page_info in pending:
+        scheduler.push(page_info['url'], page_info)
+    visited.update(p['url'] for p in pending)
+
+    while len(scheduler):
+        url, page_info = scheduler.pop()
+        source = page_info['source']
+
+        print(f"Scraping {'internal' if page_info['follow'] else 'external'}: {url}")
+        content, title, faqs, links, fetch = scrape_page(url, pool, cache, tiers)
+        if scheduler.feedback(url, fetch["status"], fetch["retry_after"]):
+            print(f"Got {fetch['status']} for {url}, retrying later")
+            scheduler.push(url, page_info)
+            continue
+        original_url = unmap_url(url)
+        category = categorize(original_url, source)
+
+        duplicate_of = None
+        if deduper is not None:
+            content, duplicate_of = deduper.check(original_url, content.split("\n"))
+        record = {
+            "source": source,
+            "category": category,
+            "title": title,
+            "url": original_url,
+            "content": ' '.join(content.split()),
+            "faqs": faqs
+        }
+        if duplicate_of is not None:
+            print(f"Duplicate of {duplicate_of}: {url}")
+            record = None if dedupe_mode == "drop" else dict(record, duplicate_of=duplicate_of)
+        if record is not None:
+            writer.write(record)
+
+        enqueued = []
+        if page_info['follow']:
+            for link in links:
+                if visited.add(link):   # de-dup on the normalized URL, fetch the one linked
+                    enqueued.append({"url": link, "source": source, "follow": True})
+                    scheduler.push(link, enqueued[-1])
+        if journal is not None:
+            journal.log_page(url, record, enqueued, deduper.last if deduper is not None else None)
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--resume", action="store_true", help="continue from the crawl journal instead of starting over")
+    ap.add_argument("--journal", default="scrape_all.journal.jsonl", help="append-only crawl journal")
+    ap.add_argument("--output", default="jiopay_rag_knowledge_base_faq.jsonl", help="JSONL knowledge-base output")
+    ap.add_argument("--compress", choices=["gzip", "zstd"], default=None)
+    ap.add_argument("--rotate-mb", type=float, default=None, help="start a new output part every N MB")
+    ap.add_argument("--dedupe", choices=["drop", "cluster", "off"], default="drop",
+                    help="duplicate pages: drop them, keep them with duplicate_of, or disable de-dup")
+    ap.add_argument("--near-distance", type=int, default=3, help="max SimHash bit distance for near-duplicates")
+    ap.add_argument("--tiers", default="fetch_tiers.json", help="learned static/render decisions per host and path ('' to disable)")
+    ap.add_argument("--min-words", type=int, default=50, help="statically fetched pages with fewer words are rendered")
+    args = ap.parse_args()
+
+    rotate = int(args.rotate_mb * 1024 * 1024) if args.rotate_mb else None
+    writer = JsonlWriter(args.output, args.compress, rotate)
+    deduper = PageDeduper(args.near_distance) if args.dedupe != "off" else None
+    journal = CrawlJournal(args.journal)
+    pending = None
+    if args.resume and journal.exists():
+        # the journal is the source of truth: re-emit its records, then carry on
+        def restore(record, dedupe_state):
+            if deduper is not None and dedupe_state is not None:
+                deduper.restore(record["url"], dedupe_state)
+            elif deduper is not None and record is not None and "duplicate_of" not in record:
+                deduper.index(record["url"], record["content"])   # journal written without de-dup state
+            if record is not None:   # None: dropped duplicate
+                writer.write(record)
+        done, seen_urls, pending = journal.replay(initial_items(), restore)
+        visited.update(seen_urls)
+        print(f"Resuming: {done} pages done, {len(pending)} pending")
+    journal.open(resume=args.resume)
+
+    cache = HttpCache("http_cache.sqlite")
+    tiers = TierPolicy(args.tiers or None, min_words=args.min_words)
+    pool = BrowserPool(size=1, setup=LOAD_POLICY.install)   # launched on the first page that needs rendering
+    try:
+        crawl(pool, HostScheduler(default_delay=1.0, user_agent="Mozilla/5.0"), writer, cache, journal, pending,
+              deduper, args.dedupe, tiers)
+    finally:
+        pool.close()
+        tiers.save()
+        journal.close()
+        writer.close()
+    print(f"Fetch tiers: {tiers.stats}")
+    print(f"HTTP cache: {cache.stats}")
+    cache.close()
+    if deduper is not None:
+        print(f"De-dup: {deduper.stats}")
+
+    print(f"Scraping completed. Total pages collected: {writer.records}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# sitemap_cache.py
+# Concurrent sitemap expansion with an on-disk ETag/Last-Modified/<lastmod> cache.
+import gzip, json, os, time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+from urllib.robotparser import RobotFileParser
+
+USER_AGENT = "research-bot/1.0 (+contact: you@example.com)"
+TIMEOUT = 20
+
+
+def _tag(el):
+    return el.tag.rsplit("}", 1)[-1]
+
+
+def parse_sitemap(body):
+    """Return (child_sitemaps, [(loc, lastmod)]) for a sitemap or sitemap index."""
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    root = ET.fromstring(body)
+    children, pages = [], []
+    for node in root:
+        fields = {_tag(c): (c.text or "").strip() for c in node}
+        loc = fields.get("loc")
+        if not loc:
+            continue
+        if _tag(node) == "sitemap":
+            children.append(loc)
+        elif _tag(node) == "url":
+            pages.append((loc, fields.get("lastmod") or None))
+    return children, pages
+
+
+class SitemapCache:
+    """JSON file remembering each sitemap's validators and entries, plus the
+    <lastmod> of every page as of the last successful crawl."""
+
+    def __init__(self, path="sitemap_cache.json"):
+        self.path = path
+        self.data = {"sitemaps": {}, "pages": {}}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data = json.load(f)
+        self.stats = {"fetched": 0, "not_modified": 0, "errors": 0}
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+    def load(self, sm_url):
+        """Fetch one sitemap conditionally; returns (children, pages), served from cache on 304/error."""
+        entry = self.data["sitemaps"].get(sm_url, {})
+        headers = {"User-Agent": USER_AGENT}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            with urlopen(Request(sm_url, headers=headers), timeout=TIMEOUT) as r:
+                body, resp_headers = r.read(), r.headers
+            children, pages = parse_sitemap(body)
+        except HTTPError as e:
+            self.stats["not_modified" if e.code == 304 else "errors"] += 1
+            return entry.get("children", []), [tuple(p) for p in entry.get("pages", [])]
+        except Exception:
+            self.stats["errors"] += 1
+            return entry.get("children", []), [tuple(p) for p in entry.get("pages", [])]
+        self.stats["fetched"] += 1
+        # dict assignment is atomic, so worker threads can update the cache directly
+        self.data["sitemaps"][sm_url] = {
+            "etag": resp_headers.get("ETag"),
+            "last_modified": resp_headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "children": children,
+            "pages": pages,
+        }
+        return children, pages
+
+    def is_changed(self, loc, lastmod):
+        # pages without <lastmod> can't be proven unchanged
+        return lastmod is None or self.data["pages"].get(loc) != lastmod
+
+    def mark_crawled(self, loc, lastmod):
+        if lastmod is not None:
+            self.data["pages"][loc] = lastmod
+
+
+def root_sitemaps(url):
+    """Sitemaps advertised in robots.txt, else the conventional /sitemap.xml."""
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    rp = RobotFileParser()
+    try:
+        with urlopen(Request(origin + "/robots.txt", headers={"User-Agent": USER_AGENT}), timeout=TIMEOUT) as r:
+            rp.parse(r.read().decode("utf-8", "replace").splitlines())
+    except Exception:
+        pass
+    return rp.site_maps() or [origin + "/sitemap.xml"]
+
+
+def expand(seeds, cache, workers=8):
+    """Expand every seed's sitemap tree level by level, fetching each level concurrently.
+
+    Returns [(loc, lastmod)] in sitemap order (duplicates included; callers de-dup).
+    """
+    level, seen, pages = [], set(), []
+    for seed in seeds:
+        level.extend(root_sitemaps(seed))
+    with ThreadPoolExecutor(workers) as pool:
+        while level:
+            level = [u for u in dict.fromkeys(level) if u not in seen]
+            seen.update(level)
+            next_level = []
+            for children, entries in pool.map(cache.load, level):
+                next_level.extend(children)
+                pages.extend(entries)
+            level = next_level
+    return pages